@@ -0,0 +1,91 @@
+import math
+import threading
+from timeit import default_timer
+
+admission = None
+def get_admission():
+    return admission
+
+class OverloadedError(Exception):
+    def __init__(self, retry_after):
+        super().__init__("Overloaded")
+        self.retry_after = retry_after
+
+class AdmissionQueue:
+    """Limits the number of requests translating at the same time.
+    Requests over the limit wait in a bounded queue for a bounded
+    amount of time, after which they are rejected.
+
+    With adaptive enabled, the concurrency limit is lowered when
+    latency rises well above the best observed latency and slowly
+    raised back (up to max_concurrency) otherwise."""
+
+    def __init__(self, max_concurrency=-1, max_queue=16, max_wait=10, adaptive=False):
+        self.enabled = max_concurrency > 0
+        self.max_limit = max_concurrency
+        self.limit = float(max_concurrency)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.adaptive = adaptive
+        self.active = 0
+        self.waiting = 0
+        self.latency = None
+        self.min_latency = None
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        if not self.enabled:
+            return
+
+        with self.cond:
+            if self.active >= int(self.limit):
+                if self.waiting >= self.max_queue:
+                    raise OverloadedError(self.get_retry_after())
+
+                self.waiting += 1
+                try:
+                    deadline = default_timer() + self.max_wait
+                    while self.active >= int(self.limit):
+                        remaining = deadline - default_timer()
+                        if remaining <= 0:
+                            raise OverloadedError(self.get_retry_after())
+                        self.cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+
+            self.active += 1
+
+    def release(self, duration=None):
+        if not self.enabled:
+            return
+
+        with self.cond:
+            self.active -= 1
+            if self.adaptive and duration is not None:
+                self.update_limit(duration)
+            self.cond.notify()
+
+    def update_limit(self, duration):
+        self.latency = duration if self.latency is None else self.latency * 0.9 + duration * 0.1
+
+        # Let the baseline drift up slowly so that it can recover
+        # from a lucky fast request
+        self.min_latency = duration if self.min_latency is None else min(self.min_latency * 1.01, duration)
+
+        if self.latency > self.min_latency * 2:
+            self.limit = max(1.0, self.limit * 0.9)
+        else:
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+
+    def get_retry_after(self):
+        if self.latency is None:
+            return max(1, int(math.ceil(self.max_wait)))
+
+        # Rough time needed to drain the queue
+        return max(1, int(math.ceil(self.latency * (self.waiting + 1) / max(1.0, self.limit))))
+
+def setup(max_concurrency, max_queue, max_wait, adaptive):
+    global admission
+
+    admission = AdmissionQueue(max_concurrency, max_queue, max_wait, adaptive)
+    return admission
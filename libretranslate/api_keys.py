@@ -1,17 +1,31 @@
+import atexit
 import os
 import sqlite3
+import threading
+import time
 import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import MappingProxyType
 
 import requests
+from apscheduler.schedulers.background import BackgroundScheduler
 from expiringdict import ExpiringDict
+from requests.adapters import HTTPAdapter
 
 from libretranslate.default_values import DEFAULT_ARGUMENTS as DEFARGS
 
 DEFAULT_DB_PATH = DEFARGS['API_KEYS_DB_PATH']
 
 
+class TooManyInvalidKeysError(Exception):
+    pass
+
+class KeyLookupError(Exception):
+    pass
+
+
 class Database:
-    def __init__(self, db_path=DEFAULT_DB_PATH, max_cache_len=1000, max_cache_age=30):
+    def __init__(self, db_path=DEFAULT_DB_PATH, reload_interval=-1):
         # Legacy check - this can be removed at some point in the near future
         if os.path.isfile("api_keys.db") and not os.path.isfile("db/api_keys.db"):
             print("Migrating {} to {}".format("api_keys.db", "db/api_keys.db"))
@@ -24,10 +38,10 @@ class Database:
         if db_dir != '' and not os.path.exists(db_dir):
             os.makedirs(db_dir)
         self.db_path = db_path
-        self.cache = ExpiringDict(max_len=max_cache_len, max_age_seconds=max_cache_age)
 
         # Make sure to do data synchronization on writes!
         self.c = sqlite3.connect(db_path, check_same_thread=False)
+        self.c.execute("PRAGMA journal_mode=WAL")
         self.c.execute(
             """CREATE TABLE IF NOT EXISTS api_keys (
             "api_key"	TEXT NOT NULL,
@@ -42,25 +56,43 @@ class Database:
         if '"char_limit" INTEGER DEFAULT NULL' not in schema:
             self.c.execute('ALTER TABLE api_keys ADD COLUMN "char_limit" INTEGER DEFAULT NULL;')
 
-    def lookup(self, api_key):
-        val = self.cache.get(api_key)
-        if val is None:
-            # DB Lookup
-            stmt = self.c.execute(
-                "SELECT req_limit, char_limit FROM api_keys WHERE api_key = ?", (api_key,)
-            )
-            row = stmt.fetchone()
-            if row is not None:
-                self.cache[api_key] = row
-                val = row
-            else:
-                self.cache[api_key] = False
-                val = False
-
-        if isinstance(val, bool):
-            val = None
+        # All keys are kept in memory, lookups never touch the database
+        self.keys = MappingProxyType({})
+        self.reload(self.c)
 
-        return val
+        if reload_interval > 0:
+            # Pick up changes made by other processes (e.g. ltmanage).
+            # data_version changes whenever another connection commits.
+            self.watch_conn = sqlite3.connect(db_path, check_same_thread=False)
+            self.data_version = self.get_data_version()
+
+            scheduler = BackgroundScheduler(daemon=True, timezone='UTC')
+            scheduler.add_job(self.check_changes, "interval", seconds=reload_interval)
+            scheduler.start()
+
+            # Shut down the scheduler when exiting the app
+            atexit.register(lambda: scheduler.shutdown())
+
+    def get_data_version(self):
+        return self.watch_conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def check_changes(self):
+        try:
+            data_version = self.get_data_version()
+            if data_version != self.data_version:
+                self.data_version = data_version
+                self.reload(self.watch_conn)
+        except Exception as e:
+            print("Cannot reload API keys: " + str(e))
+
+    def reload(self, conn):
+        rows = conn.execute("SELECT api_key, req_limit, char_limit FROM api_keys").fetchall()
+
+        # Swap the whole map, readers never see a partial update
+        self.keys = MappingProxyType({api_key: (req_limit, char_limit) for api_key, req_limit, char_limit in rows})
+
+    def lookup(self, api_key, client=None):
+        return self.keys.get(api_key)
 
     def add(self, req_limit, api_key="auto", char_limit=None):
         if api_key == "auto":
@@ -74,11 +106,13 @@ class Database:
             (api_key, req_limit, char_limit),
         )
         self.c.commit()
+        self.reload(self.c)
         return (api_key, req_limit, char_limit)
 
     def remove(self, api_key):
         self.c.execute("DELETE FROM api_keys WHERE api_key = ?", (api_key,))
         self.c.commit()
+        self.reload(self.c)
         return api_key
 
     def all(self):
@@ -87,26 +121,134 @@ class Database:
 
 
 class RemoteDatabase:
-    def __init__(self, url, max_cache_len=1000, max_cache_age=600):
+    """API keys looked up from a remote service.
+
+    Entries older than max_cache_age are still served (up to max_stale_age)
+    while being refreshed in the background, invalid keys are remembered
+    for negative_cache_age seconds and concurrent lookups
+    of the same key share a single HTTP request. Clients sending more
+    than invalid_key_budget unknown keys per invalid_key_window seconds
+    get TooManyInvalidKeysError for keys that are not cached, without
+    asking the remote service. When the remote service cannot be reached,
+    stale entries are served and other keys raise KeyLookupError."""
+
+    def __init__(self, url, max_cache_len=1000, max_cache_age=600, max_stale_age=3600, negative_cache_age=30, timeout=5, workers=4, max_connections=32, invalid_key_budget=10, invalid_key_window=60):
         self.url = url
-        self.cache = ExpiringDict(max_len=max_cache_len, max_age_seconds=max_cache_age)
-
-    def lookup(self, api_key):
-        val = self.cache.get(api_key)
-        if val is None:
-            try:
-                r = requests.post(self.url, data={'api_key': api_key}, timeout=60)
-                res = r.json()
-            except Exception as e:
-                print("Cannot authenticate API key: " + str(e))
-                return None
-
-            if res.get('error') is not None:
-                return None
-
-            req_limit = res.get('req_limit', None)
-            char_limit = res.get('char_limit', None)
+        self.max_cache_age = max_cache_age
+        self.negative_cache_age = negative_cache_age
+        self.timeout = timeout
+        self.cache = ExpiringDict(max_len=max_cache_len, max_age_seconds=max(max_stale_age, max_cache_age)) # api key --> (limits, fresh until)
+
+        # Each client can try at most invalid_key_budget unknown
+        # keys every invalid_key_window seconds
+        self.invalid_key_budget = invalid_key_budget
+        self.invalid_key_window = invalid_key_window
+        self.invalid_keys = ExpiringDict(max_len=10000, max_age_seconds=invalid_key_window) # client --> (invalid keys, window start)
+
+        # Keep connections to the remote service alive
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=max_connections))
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=max_connections))
+
+        # Only used to revalidate stale entries, cold lookups
+        # run in the thread of the request
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="libretranslate-apikeys")
+        self.inflight = {}
+        self.lock = threading.Lock()
+
+    def lookup(self, api_key, client=None):
+        """Limits of api_key, or None if it's not valid. client
+        identifies who is asking (e.g. their IP address)"""
+        entry = self.cache.get(api_key)
+        if entry is not None:
+            val, fresh_until = entry
+            if time.time() < fresh_until:
+                return val
+
+            if val is not None:
+                # Serve the stale entry while revalidating
+                self.refresh(api_key)
+                return val
+
+        if client is not None and self.over_invalid_budget(client):
+            # Don't let clients trying out random keys
+            # hit the remote service
+            raise TooManyInvalidKeysError()
+
+        val = self.fetch(api_key)
+        if val is None and client is not None:
+            self.add_invalid(client)
+        return val
 
-            val = self.cache[api_key] = (req_limit, char_limit)
-            
+    def over_invalid_budget(self, client):
+        if self.invalid_key_budget <= 0:
+            return False
+
+        entry = self.invalid_keys.get(client)
+        return entry is not None and entry[0] >= self.invalid_key_budget
+
+    def add_invalid(self, client):
+        with self.lock:
+            now = time.time()
+            entry = self.invalid_keys.get(client)
+            if entry is None or now - entry[1] >= self.invalid_key_window:
+                entry = (0, now)
+            self.invalid_keys[client] = (entry[0] + 1, entry[1])
+
+    def fetch(self, api_key):
+        """Load api_key in the calling thread, or wait for
+        the thread that is already loading it"""
+        with self.lock:
+            future = self.inflight.get(api_key)
+            leader = future is None
+            if leader:
+                future = self.inflight[api_key] = Future()
+
+        if not leader:
+            return future.result()
+
+        try:
+            val = self.load(api_key)
+            future.set_result(val)
+            return val
+        except Exception as e:
+            future.set_exception(e)
+            raise e
+        finally:
+            with self.lock:
+                del self.inflight[api_key]
+
+    def refresh(self, api_key):
+        with self.lock:
+            if api_key in self.inflight:
+                return
+        self.executor.submit(self.fetch, api_key)
+
+    def load(self, api_key):
+        try:
+            r = self.session.post(self.url, data={'api_key': api_key}, timeout=self.timeout)
+            if r.status_code >= 500:
+                raise Exception(f"HTTP {r.status_code}")
+            res = r.json()
+        except Exception as e:
+            print("Cannot authenticate API key: " + str(e))
+
+            # Keep serving what we had, if anything, and try again
+            # later. Failures are never cached as invalid keys.
+            entry = self.cache.get(api_key)
+            if entry is not None and entry[0] is not None:
+                self.cache[api_key] = (entry[0], time.time() + self.negative_cache_age)
+                return entry[0]
+
+            raise KeyLookupError(str(e))
+
+        if res.get('error') is not None:
+            self.cache[api_key] = (None, time.time() + self.negative_cache_age)
+            return None
+
+        req_limit = res.get('req_limit', None)
+        char_limit = res.get('char_limit', None)
+
+        val = (req_limit, char_limit)
+        self.cache[api_key] = (val, time.time() + self.max_cache_age)
         return val
@@ -1,4 +1,5 @@
 import io
+import json
 import math
 import os
 import re
@@ -13,7 +14,7 @@ from timeit import default_timer
 
 import argostranslatefiles
 from argostranslatefiles import get_supported_formats
-from flask import Blueprint, Flask, Response, abort, jsonify, render_template, request, send_file, url_for, make_response
+from flask import Blueprint, Flask, Response, abort, g, jsonify, render_template, request, send_file, stream_with_context, url_for, make_response
 from flask_babel import Babel
 from flask_swagger import swagger
 from flask_swagger_ui import get_swaggerui_blueprint
@@ -22,8 +23,8 @@ from werkzeug.exceptions import HTTPException
 from werkzeug.http import http_date
 from werkzeug.utils import secure_filename
 
-from libretranslate import flood, remove_translated_files, scheduler, secret, security, storage, cache
-from libretranslate.language import model2iso, iso2model, detect_languages, improve_translation_formatting, get_language_with_fallback
+from libretranslate import flood, remove_translated_files, scheduler, secret, security, storage, cache, batching, microbatch, jobs, residency, admission, singleflight
+from libretranslate.language import model2iso, iso2model, detect_languages, detect_each_language, improve_translation_formatting, get_registry
 from libretranslate.locales import (
     _,
     _lazy,
@@ -35,7 +36,7 @@ from libretranslate.locales import (
     lazy_swag,
 )
 
-from .api_keys import Database, RemoteDatabase
+from .api_keys import Database, KeyLookupError, RemoteDatabase, TooManyInvalidKeysError
 from .suggestions import Database as SuggestionsDatabase
 
 # Rough map of emoji characters
@@ -107,52 +108,71 @@ def get_fingerprint():
     return request.headers.get("User-Agent", "") + request.headers.get("Cookie", "")
 
 
-def get_req_limits(default_limit, api_keys_db, db_multiplier=1, multiplier=1):
-    req_limit = default_limit
+class AuthContext:
+    """Client address and API key of a request. The API key limits
+    are looked up at most once per request."""
+
+    def __init__(self, ip, api_key, api_keys_db):
+        self.ip = ip
+        self.api_key = api_key
+        self.api_keys_db = api_keys_db
+        self.limits = None
+        self.lookup_error = None
+        self.looked_up = False
+
+    def get_limits(self):
+        """(req_limit, char_limit) of the API key, or None
+        if there's no valid API key (see lookup_error when
+        the key could not be checked)"""
+        if not self.looked_up:
+            if self.api_keys_db and self.api_key:
+                try:
+                    self.limits = self.api_keys_db.lookup(self.api_key, self.ip)
+                except Exception as e:
+                    self.lookup_error = e
+            self.looked_up = True
+
+        return self.limits
 
-    if api_keys_db:
-        api_key = get_req_api_key()
 
-        if api_key:
-            api_key_limits = api_keys_db.lookup(api_key)
-            if api_key_limits is not None:
-                req_limit = api_key_limits[0] * db_multiplier
+def get_req_limits(default_limit, auth, db_multiplier=1, multiplier=1):
+    req_limit = default_limit
+
+    api_key_limits = auth.get_limits()
+    if api_key_limits is not None:
+        req_limit = api_key_limits[0] * db_multiplier
 
     return int(req_limit * multiplier)
 
 
-def get_char_limit(default_limit, api_keys_db):
+def get_char_limit(default_limit, auth):
     char_limit = default_limit
 
-    if api_keys_db:
-        api_key = get_req_api_key()
-
-        if api_key:
-            api_key_limits = api_keys_db.lookup(api_key)
-            if api_key_limits is not None:
-                if api_key_limits[1] is not None:
-                    char_limit = api_key_limits[1]
+    api_key_limits = auth.get_limits()
+    if api_key_limits is not None:
+        if api_key_limits[1] is not None:
+            char_limit = api_key_limits[1]
 
     return char_limit
 
 
-def get_routes_limits(args, api_keys_db):
+def get_routes_limits(args, get_auth):
     default_req_limit = args.req_limit
     if default_req_limit == -1:
         # TODO: better way?
         default_req_limit = 9999999999999
 
     def minute_limits():
-        return "%s per minute" % get_req_limits(default_req_limit, api_keys_db)
+        return "%s per minute" % get_req_limits(default_req_limit, get_auth())
 
     def hourly_limits(n):
         def func():
           decay = (0.75 ** (n - 1))
-          return "{} per {} hour".format(get_req_limits(args.hourly_req_limit * n, api_keys_db, int(os.environ.get("LT_HOURLY_REQ_LIMIT_MULTIPLIER", 60) * n), decay), n)
+          return "{} per {} hour".format(get_req_limits(args.hourly_req_limit * n, get_auth(), int(os.environ.get("LT_HOURLY_REQ_LIMIT_MULTIPLIER", 60) * n), decay), n)
         return func
 
     def daily_limits():
-        return "%s per day" % get_req_limits(args.daily_req_limit, api_keys_db, int(os.environ.get("LT_DAILY_REQ_LIMIT_MULTIPLIER", 1440)))
+        return "%s per day" % get_req_limits(args.daily_req_limit, get_auth(), int(os.environ.get("LT_DAILY_REQ_LIMIT_MULTIPLIER", 1440)))
 
     res = [minute_limits]
 
@@ -188,7 +208,8 @@ def create_app(args):
 
     boot(args.load_only, args.update_models, args.force_update_models)
 
-    from libretranslate.language import load_languages
+    from libretranslate.language import load_languages, load_lang_codes
+    from libretranslate.detect import get_ngram_model
 
     swagger_url = args.url_prefix + "/docs"  # Swagger UI (w/o trailing '/')
     api_url = "/spec"
@@ -196,11 +217,23 @@ def create_app(args):
     bp = Blueprint('Main app', __name__)
 
     storage.setup(args.shared_storage)
-    trans_cache = cache.setup(args.translation_cache)
+    trans_cache = cache.setup(args.translation_cache, args.translation_cache_l1, args.translation_cache_l1_ttl)
+    cache.setup_segments(args.segment_cache)
+    detection_cache = cache.setup_detection(args.detection_cache, args.detection_cache_storage)
+    batching.setup(args.decode_max_tokens)
+    batcher = microbatch.setup(args.batch_window, args.batch_max_tokens)
+    job_manager = jobs.setup(args.job_workers, args.job_queue_limit)
+    model_residency = residency.setup(args.model_memory_budget, args.model_idle_ttl)
+    flights = singleflight.setup()
+    admission_queue = admission.setup(args.max_concurrency, args.max_queue_depth, args.max_queue_wait, args.adaptive_concurrency)
 
     if not args.disable_files_translation:
         remove_translated_files.setup(get_upload_dir())
     languages = load_languages()
+    registry = get_registry()
+
+    # Compile the language detection profiles before the first request
+    get_ngram_model(load_lang_codes())
     language_pairs = {}
     for lang in languages:
         language_pairs[lang.code] = sorted([l.to_lang.code for l in lang.translations_from])
@@ -211,10 +244,7 @@ def create_app(args):
             "obj", (object,), {"code": "auto", "name": _("Auto Detect")}
         )
     else:
-        frontend_argos_language_source = next(
-            iter([l for l in languages if l.code == args.frontend_language_source]),
-            None,
-        )
+        frontend_argos_language_source = registry.get(args.frontend_language_source)
     if frontend_argos_language_source is None:
         frontend_argos_language_source = languages[0]
 
@@ -224,18 +254,14 @@ def create_app(args):
     if args.frontend_language_target == "locale":
       def resolve_language_locale():
           loc = get_locale()
-          language_target = next(
-              iter([l for l in languages if l.code == loc]), None
-          )
+          language_target = get_registry().get(loc)
           if language_target is None:
             language_target = language_target_fallback
           return language_target
 
       frontend_argos_language_target = resolve_language_locale
     else:
-      language_target = next(
-          iter([l for l in languages if l.code == args.frontend_language_target]), None
-      )
+      language_target = registry.get(args.frontend_language_target)
       if language_target is None:
         language_target = language_target_fallback
       frontend_argos_language_target = lambda: language_target
@@ -248,7 +274,7 @@ def create_app(args):
 
     api_keys_db = None
 
-    def get_remote_address():
+    def resolve_remote_address():
       if args.trust_forwarded_for and request.headers.getlist("X-Forwarded-For"):
           ip = request.headers.getlist("X-Forwarded-For")[0].split(",")[0]
       else:
@@ -256,10 +282,19 @@ def create_app(args):
 
       return ip
 
+    def get_auth():
+      # Shared by the limiter, access checks and metrics of the request
+      if "auth" not in g:
+          g.auth = AuthContext(resolve_remote_address(), get_req_api_key(), api_keys_db)
+      return g.auth
+
+    def get_remote_address():
+      return get_auth().ip
+
     if args.req_limit > 0 or args.api_keys or args.daily_req_limit > 0 or args.hourly_req_limit > 0:
         api_keys_db = None
         if args.api_keys:
-            api_keys_db = RemoteDatabase(args.api_keys_remote) if args.api_keys_remote else Database(args.api_keys_db_path)
+            api_keys_db = RemoteDatabase(args.api_keys_remote) if args.api_keys_remote else Database(args.api_keys_db_path, reload_interval=5)
 
         from flask_limiter import Limiter
 
@@ -273,8 +308,8 @@ def create_app(args):
         def get_limits_key_func():
           if args.api_keys:
             def func():
-              ak = get_req_api_key()
-              return ak if ak else get_remote_address()
+              auth = get_auth()
+              return auth.api_key if auth.api_key else auth.ip
             return func
           else:
             return get_remote_address
@@ -282,7 +317,7 @@ def create_app(args):
         limiter = Limiter(
             key_func=get_limits_key_func(),
             default_limits=get_routes_limits(
-                args, api_keys_db
+                args, get_auth
             ),
             storage_uri=args.req_limit_storage,
             default_limits_deduct_when=lambda req: True, # Force cost to be called after the request
@@ -303,6 +338,7 @@ def create_app(args):
 
     measure_request = None
     gauge_request = None
+    duplicates_counter = None
     if args.metrics:
       if os.environ.get("PROMETHEUS_MULTIPROC_DIR") is None:
           default_mp_dir = os.path.abspath(os.path.join("db", "prometheus"))
@@ -310,7 +346,7 @@ def create_app(args):
             os.mkdir(default_mp_dir)
           os.environ["PROMETHEUS_MULTIPROC_DIR"] = default_mp_dir
 
-      from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Gauge, Summary, generate_latest, multiprocess
+      from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Summary, generate_latest, multiprocess
 
       @bp.route("/metrics")
       @limiter.exempt
@@ -330,24 +366,50 @@ def create_app(args):
       gauge_request = Gauge('libretranslate_http_requests_in_flight', 'Active requests', ['endpoint', 'request_ip', 'api_key'], multiprocess_mode='livesum')
       gauge_request.labels('/translate', '127.0.0.1', '')
 
+      model_residency.resident_gauge = Gauge('libretranslate_models_resident', 'Translation models loaded in memory', multiprocess_mode='livesum')
+      model_residency.evicted_counter = Counter('libretranslate_models_evicted', 'Translation models unloaded from memory')
+      duplicates_counter = Counter('libretranslate_batch_duplicates', 'Duplicate batch items translated only once')
+      trans_cache.lookups_counter = Counter('libretranslate_translation_cache_lookups', 'Translation cache lookups by tier (l1, l2 or miss)', ['result'])
+      detection_cache.lookups_counter = Counter('libretranslate_detection_cache_lookups', 'Language detection cache lookups', ['result'])
+
     def access_check(f):
         @wraps(f)
         def func(*a, **kw):
-            ip = get_remote_address()
-
-            if flood.is_banned(ip):
+            auth = get_auth()
+            ip = auth.ip
+
+            # Read everything the checks below need in a single round trip
+            keys = []
+            if flood.active:
+                keys.append(flood.score_key(ip))
+            if args.api_keys and args.require_api_key_fingerprint:
+                keys.append(flood.fingerprint_key(ip))
+            load_secrets = args.api_keys and args.require_api_key_secret and secret.get_cached_secrets() is None
+            if load_secrets:
+                keys += secret.SECRET_KEYS
+
+            values = dict(zip(keys, storage.get_storage().get_many(keys))) if keys else {}
+            if load_secrets:
+                secret.cache_secrets(values)
+
+            if flood.is_banned(ip, values.get(flood.score_key(ip))):
                 abort(403, description=_("Too many request limits violations"))
 
             if args.api_keys:
-                ak = get_req_api_key()
-                if ak and api_keys_db.lookup(ak) is None:
+                key_missing = auth.get_limits() is None
+                if isinstance(auth.lookup_error, TooManyInvalidKeysError):
+                    abort(429, description=_("Too many invalid API keys, please try again later"))
+                elif isinstance(auth.lookup_error, KeyLookupError):
+                    abort(503, description=_("Cannot verify the API key, please try again later"), retry_after=10)
+                elif auth.lookup_error is not None:
+                    raise auth.lookup_error
+                elif auth.api_key and key_missing:
                     abort(
                         403,
                         description=_("Invalid API key"),
                     )
                 else:
                   need_key = False
-                  key_missing = api_keys_db.lookup(ak) is None
 
                   if (args.require_api_key_origin
                       and key_missing
@@ -371,7 +433,7 @@ def create_app(args):
 
                   if (args.require_api_key_fingerprint
                     and key_missing):
-                    if flood.fingerprint_mismatch(ip, get_fingerprint()):
+                    if flood.fingerprint_mismatch(ip, get_fingerprint(), values.get(flood.fingerprint_key(ip))):
                       need_key = True
 
                   if args.under_attack and key_missing:
@@ -393,8 +455,9 @@ def create_app(args):
           def measure_func(*a, **kw):
               start_t = default_timer()
               status = 200
-              ip = get_remote_address()
-              ak = get_req_api_key() or ''
+              auth = get_auth()
+              ip = auth.ip
+              ak = auth.api_key or ''
               g = gauge_request.labels(request.path, ip, ak)
               try:
                 g.inc()
@@ -419,6 +482,23 @@ def create_app(args):
               request.duration = max(default_timer() - start_t, 0)
           return time_func
 
+    def admit():
+        try:
+            admission_queue.acquire()
+        except admission.OverloadedError as e:
+            abort(503, description=_("Server is busy, please try again later"), retry_after=e.retry_after)
+
+    def admission_check(f):
+        @wraps(f)
+        def func(*a, **kw):
+            admit()
+            start_t = default_timer()
+            try:
+                return f(*a, **kw)
+            finally:
+                admission_queue.release(default_timer() - start_t)
+        return func
+
     @bp.errorhandler(400)
     def invalid_api(e):
         return jsonify({"error": str(e.description)}), 400
@@ -436,6 +516,13 @@ def create_app(args):
     def denied(e):
         return jsonify({"error": str(e.description)}), 403
 
+    @bp.errorhandler(503)
+    def unavailable(e):
+        headers = {}
+        if getattr(e, "retry_after", None) is not None:
+            headers["Retry-After"] = str(e.retry_after)
+        return jsonify({"error": str(e.description)}), 503, headers
+
     @bp.route("/")
     @limiter.exempt
     def index():
@@ -572,8 +659,287 @@ def create_app(args):
         response.headers.add("Access-Control-Max-Age", 60 * 60 * 24 * 20)
         return response
 
+    def get_translate_request():
+        if request.is_json:
+            json = get_json_dict(request)
+            q = json.get("q")
+            source_lang = iso2model(json.get("source"))
+            target_lang = iso2model(json.get("target"))
+            text_format = json.get("format")
+            num_alternatives = int(json.get("alternatives", 0))
+        else:
+            q = request.values.get("q")
+            source_lang = iso2model(request.values.get("source"))
+            target_lang = iso2model(request.values.get("target"))
+            text_format = request.values.get("format")
+            num_alternatives = request.values.get("alternatives", 0)
+
+        if not q:
+            abort(400, description=_("Invalid request: missing %(name)s parameter", name='q'))
+        if not source_lang:
+            abort(400, description=_("Invalid request: missing %(name)s parameter", name='source'))
+        if not target_lang:
+            abort(400, description=_("Invalid request: missing %(name)s parameter", name='target'))
+
+        try:
+            num_alternatives = max(0, int(num_alternatives))
+        except ValueError:
+            abort(400, description=_("Invalid request: %(name)s parameter is not a number", name='alternatives'))
+
+        if args.alternatives_limit != -1 and num_alternatives > args.alternatives_limit:
+            abort(400, description=_("Invalid request: %(name)s parameter must be <= %(value)s", name='alternatives', value=args.alternatives_limit))
+
+        if not request.is_json:
+            # Normalize line endings to UNIX style (LF) only so we can consistently
+            # enforce character limits.
+            # https://www.rfc-editor.org/rfc/rfc2046#section-4.1.1
+            q = "\n".join(q.splitlines())
+
+        char_limit = get_char_limit(args.char_limit, get_auth())
+
+        batch = isinstance(q, list)
+
+        if batch and args.batch_limit != -1:
+            batch_size = len(q)
+            if args.batch_limit < batch_size:
+                abort(
+                    400,
+                    description=_("Invalid request: request (%(size)s) exceeds text limit (%(limit)s)", size=batch_size, limit=args.batch_limit),
+                )
+
+        src_texts = q if batch else [q]
+
+        ak = get_auth().api_key
+        cache_key = None
+        hit = None
+        flight_key = trans_cache.key(q, source_lang, target_lang, text_format, num_alternatives)
+        if trans_cache.should_check(ak):
+          cache_key = flight_key
+          hit = trans_cache.get(cache_key)
+          if hit is not None:
+            return {"hit": hit}
+
+        if char_limit != -1:
+            for text in src_texts:
+                if len(text) > char_limit:
+                    abort(
+                        400,
+                        description=_("Invalid request: request (%(size)s) exceeds text limit (%(limit)s)", size=len(text), limit=char_limit),
+                    )
+
+        if batch:
+            request.req_cost = max(1, len(q))
+
+        registry = get_registry()
+        translatable = detect_translatable(src_texts)
+
+        tgt_lang = registry.get(target_lang)
+
+        if tgt_lang is None:
+            abort(400, description=_("%(lang)s is not supported",lang=target_lang))
+
+        if not text_format:
+            text_format = "text"
+
+        if text_format not in ["text", "html"]:
+            abort(400, description=_("%(format)s format is not supported", format=text_format))
+
+        detected_src_lang = None
+        detected_src_langs = None
+        translator = None
+        item_translators = None
+        if batch and translatable and source_lang == "auto":
+            # Batches can mix languages, route every item
+            # from its own detected language
+            detected_src_langs = []
+            item_translators = []
+            for text, detected in zip(src_texts, detect_each_language(src_texts)):
+                if not detect_translatable(text):
+                    detected_src_langs.append({"confidence": 0.0, "language": "en"})
+                    item_translators.append(None)
+                    continue
+
+                item_src_lang = registry.get_with_fallback(detected["language"])
+                if item_src_lang is None:
+                    abort(400, description=_("%(lang)s is not supported", lang=detected["language"]))
+
+                detected_src_langs.append(detected)
+                if item_src_lang.code == tgt_lang.code:
+                    # Already in the target language
+                    item_translators.append(None)
+                    continue
+
+                item_translator = registry.get_translation(item_src_lang, tgt_lang)
+                if item_translator is None:
+                    abort(400, description=_("%(tname)s (%(tcode)s) is not available as a target language from %(sname)s (%(scode)s)", tname=_lazy(tgt_lang.name), tcode=tgt_lang.code, sname=_lazy(item_src_lang.name), scode=item_src_lang.code))
+                item_translators.append(item_translator)
+        else:
+            if translatable:
+              if source_lang == "auto":
+                  candidate_langs = detect_languages(src_texts)
+                  detected_src_lang = candidate_langs[0]
+                  src_lang = registry.get_with_fallback(detected_src_lang["language"])
+              else:
+                  detected_src_lang = {"confidence": 100.0, "language": source_lang}
+                  src_lang = registry.get(source_lang)
+            else:
+              detected_src_lang = {"confidence": 0.0, "language": "en"}
+              src_lang = registry.get("en")
+
+            if src_lang is None:
+                abort(400, description=_("%(lang)s is not supported", lang=source_lang))
+
+            translator = registry.get_translation(src_lang, tgt_lang)
+            if translator is None:
+                abort(400, description=_("%(tname)s (%(tcode)s) is not available as a target language from %(sname)s (%(scode)s)", tname=_lazy(tgt_lang.name), tcode=tgt_lang.code, sname=_lazy(src_lang.name), scode=src_lang.code))
+
+        return {
+            "hit": hit,
+            "cache_key": cache_key,
+            "flight_key": flight_key,
+            "q": q,
+            "batch": batch,
+            "src_texts": src_texts,
+            "source_lang": source_lang,
+            "text_format": text_format,
+            "num_alternatives": num_alternatives,
+            "translatable": translatable,
+            "detected_src_lang": detected_src_lang,
+            "detected_src_langs": detected_src_langs,
+            "translator": translator,
+            "item_translators": item_translators,
+        }
+
+    def translate_items(treq):
+        """Translate all texts of the request, one batch per source language"""
+        src_texts = treq["src_texts"]
+        if treq["item_translators"] is None:
+            return translate_texts(treq, src_texts)
+
+        groups = {}
+        for i, translator in enumerate(treq["item_translators"]):
+            groups.setdefault(translator, []).append(i)
+
+        translated_texts = [None] * len(src_texts)
+        texts_alternatives = [None] * len(src_texts)
+        for translator, indexes in groups.items():
+            texts = [src_texts[i] for i in indexes]
+            if translator is None:
+                translated, alternatives = texts, [[] for text in texts]
+            else:
+                translated, alternatives = translate_texts(dict(treq, translator=translator), texts)
+
+            for i, t, a in zip(indexes, translated, alternatives):
+                translated_texts[i] = t
+                texts_alternatives[i] = a
+
+        return translated_texts, texts_alternatives
+
+    def translate_texts(treq, texts):
+        # Translate each distinct text only once
+        unique_texts = list(dict.fromkeys(texts))
+        if len(unique_texts) < len(texts):
+            if duplicates_counter is not None:
+                duplicates_counter.inc(len(texts) - len(unique_texts))
+
+            translated_texts, texts_alternatives = translate_unique_texts(treq, unique_texts)
+            translations = dict(zip(unique_texts, zip(translated_texts, texts_alternatives)))
+            return [translations[t][0] for t in texts], [list(translations[t][1]) for t in texts]
+
+        return translate_unique_texts(treq, texts)
+
+    def translate_unique_texts(treq, texts):
+        translator = treq["translator"]
+        num_alternatives = treq["num_alternatives"]
+
+        if treq["translatable"]:
+            if treq["text_format"] == "html":
+                with residency.lease(translator):
+                    translated_texts = [unescape(str(translate_html(translator, text))) for text in texts]
+                texts_alternatives = [[] for text in texts] # Not supported for html yet
+            else:
+                translated_texts = []
+                texts_alternatives = []
+                for text, hypotheses in zip(texts, batcher.hypotheses(translator, texts, num_alternatives + 1)):
+                    translated_text = unescape(improve_translation_formatting(text, hypotheses[0].value))
+                    translated_texts.append(translated_text)
+                    texts_alternatives.append(filter_unique([unescape(improve_translation_formatting(text, hypotheses[i].value)) for i in range(1, len(hypotheses))], translated_text))
+        else:
+            translated_texts = list(texts) # Cannot translate, send the original text back
+            texts_alternatives = [[] for text in texts]
+
+        return translated_texts, texts_alternatives
+
+    def get_translate_result(treq, translated_texts, texts_alternatives):
+        detected_src_lang = treq["detected_src_lang"]
+
+        if treq["batch"]:
+            result = {"translatedText": translated_texts}
+
+            if treq["detected_src_langs"] is not None:
+                result["detectedLanguage"] = [model2iso(d) for d in treq["detected_src_langs"]]
+            elif treq["source_lang"] == "auto":
+                result["detectedLanguage"] = [model2iso(detected_src_lang)] * len(translated_texts)
+            if treq["num_alternatives"] > 0:
+                result["alternatives"] = texts_alternatives
+        else:
+            result = {"translatedText": translated_texts[0]}
+
+            if treq["source_lang"] == "auto":
+                result["detectedLanguage"] = model2iso(detected_src_lang)
+            if treq["num_alternatives"] > 0:
+                result["alternatives"] = texts_alternatives[0]
+
+        return result
+
+    def translate_chunks(treq):
+        """Translate item by item (or paragraph by paragraph for a single text),
+        yielding each translated chunk and finally the complete result"""
+        num_hypotheses = treq["num_alternatives"] + 1
+
+        if treq["batch"]:
+            translated_texts = []
+            texts_alternatives = []
+            item_translators = treq["item_translators"]
+            for i, text in enumerate(treq["src_texts"]):
+                if item_translators is None:
+                    translated, alternatives = translate_texts(treq, [text])
+                elif item_translators[i] is None:
+                    translated, alternatives = [text], [[]]
+                else:
+                    translated, alternatives = translate_texts(dict(treq, translator=item_translators[i]), [text])
+                translated_texts += translated
+                texts_alternatives += alternatives
+                yield {"index": i, "translatedText": translated[0], "alternatives": alternatives[0]}
+        elif treq["translatable"] and treq["text_format"] == "text":
+            # Combine paragraph hypotheses like argostranslate does
+            # for the final result
+            q = treq["q"]
+            combined = [""] * num_hypotheses
+            for i, paragraph in enumerate(q.split("\n")):
+                hypotheses = batcher.hypotheses(treq["translator"], [paragraph], num_hypotheses)[0]
+                for j in range(len(combined)):
+                    combined[j] = combined[j] + "\n" + hypotheses[j].value
+                translated_text = unescape(improve_translation_formatting(paragraph, hypotheses[0].value))
+                yield {"index": i, "translatedText": translated_text, "alternatives": filter_unique([unescape(improve_translation_formatting(paragraph, h.value)) for h in hypotheses[1:]], translated_text)}
+
+            combined = [c.lstrip("\n") for c in combined]
+            translated_texts = [unescape(improve_translation_formatting(q, combined[0]))]
+            texts_alternatives = [filter_unique([unescape(improve_translation_formatting(q, c)) for c in combined[1:]], translated_texts[0])]
+        else:
+            translated_texts, texts_alternatives = translate_texts(treq, treq["src_texts"])
+            yield {"index": 0, "translatedText": translated_texts[0], "alternatives": texts_alternatives[0]}
+
+        result = get_translate_result(treq, translated_texts, texts_alternatives)
+
+        if treq["cache_key"] is not None:
+          trans_cache.cache(treq["cache_key"], result)
+
+        yield result
+
     @bp.post("/translate")
     @access_check
+    @admission_check
     def translate():
         """
         Translate Text
@@ -722,164 +1088,264 @@ def create_app(args):
                   type: string
                   description: Error message
         """
-        if request.is_json:
-            json = get_json_dict(request)
-            q = json.get("q")
-            source_lang = iso2model(json.get("source"))
-            target_lang = iso2model(json.get("target"))
-            text_format = json.get("format")
-            num_alternatives = int(json.get("alternatives", 0))
-        else:
-            q = request.values.get("q")
-            source_lang = iso2model(request.values.get("source"))
-            target_lang = iso2model(request.values.get("target"))
-            text_format = request.values.get("format")
-            num_alternatives = request.values.get("alternatives", 0)
+        treq = get_translate_request()
+        if treq["hit"] is not None:
+            return Response(treq["hit"], status=200, mimetype="application/json")
 
-        if not q:
-            abort(400, description=_("Invalid request: missing %(name)s parameter", name='q'))
-        if not source_lang:
-            abort(400, description=_("Invalid request: missing %(name)s parameter", name='source'))
-        if not target_lang:
-            abort(400, description=_("Invalid request: missing %(name)s parameter", name='target'))
+        def compute():
+            translated_texts, texts_alternatives = translate_items(treq)
+            result = get_translate_result(treq, translated_texts, texts_alternatives)
+
+            if treq["cache_key"] is not None:
+              trans_cache.cache(treq["cache_key"], result)
+
+            return result
+
+        def lookup_cache():
+            hit = trans_cache.get(treq["cache_key"])
+            return json.loads(hit) if hit is not None else None
+
+        # Other workers translating the same text write it to the cache
+        lookup = lookup_cache if treq["cache_key"] is not None else None
 
         try:
-            num_alternatives = max(0, int(num_alternatives))
-        except ValueError:
-            abort(400, description=_("Invalid request: %(name)s parameter is not a number", name='alternatives'))
+            # Concurrent identical requests share a single translation
+            result = flights.do(treq["flight_key"], compute, lookup)
+            return jsonify(result)
+        except Exception as e:
+            raise e
+            abort(500, description=_("Cannot translate text: %(text)s", text=str(e)))
 
-        if args.alternatives_limit != -1 and num_alternatives > args.alternatives_limit:
-            abort(400, description=_("Invalid request: %(name)s parameter must be <= %(value)s", name='alternatives', value=args.alternatives_limit))
+    @bp.post("/translate_stream")
+    @access_check
+    def translate_stream():
+        """
+        Translate Text (Streaming)
+        ---
+        tags:
+          - translate
+        parameters:
+          - in: formData
+            name: q
+            schema:
+              oneOf:
+                - type: string
+                  example: Hello world!
+                - type: array
+                  example: ['Hello world!']
+            required: true
+            description: Text(s) to translate
+          - in: formData
+            name: source
+            schema:
+              type: string
+              example: en
+            required: true
+            description: Source language code or "auto" for auto detection
+          - in: formData
+            name: target
+            schema:
+              type: string
+              example: es
+            required: true
+            description: Target language code
+          - in: formData
+            name: format
+            schema:
+              type: string
+              enum: [text, html]
+              default: text
+              example: text
+            required: false
+            description: >
+              Format of source text:
+               * `text` - Plain text
+               * `html` - HTML markup
+          - in: formData
+            name: alternatives
+            schema:
+              type: integer
+              default: 0
+              example: 3
+            required: false
+            description: Preferred number of alternative translations
+          - in: formData
+            name: api_key
+            schema:
+              type: string
+              example: xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx
+            required: false
+            description: API key
+        produces:
+          - application/x-ndjson
+        responses:
+          200:
+            description: >
+              Newline delimited JSON. Each line with an `index` holds the translation
+              of one batch item (or of one paragraph when `q` is a string) as soon as it
+              is available. The last line holds the complete translation, in the same
+              format as /translate.
+            schema:
+              id: translate-stream
+              type: object
+              properties:
+                index:
+                  type: integer
+                  description: Index of the translated item or paragraph
+                translatedText:
+                  type: string
+                  description: Translated text
+                alternatives:
+                  type: array
+                  items:
+                    type: string
+                  description: Alternative translations
+                error:
+                  type: string
+                  description: Error message, if the translation failed while streaming
+          400:
+            description: Invalid request
+            schema:
+              id: error-response
+              type: object
+              properties:
+                error:
+                  type: string
+                  description: Error message
+          429:
+            description: Slow down
+            schema:
+              id: error-slow-down
+              type: object
+              properties:
+                error:
+                  type: string
+                  description: Reason for slow down
+          403:
+            description: Banned
+            schema:
+              id: error-response
+              type: object
+              properties:
+                error:
+                  type: string
+                  description: Error message
+        """
+        # Hold the admission slot until the whole response has been streamed
+        admit()
+        start_t = default_timer()
+        streaming = False
 
-        if not request.is_json:
-            # Normalize line endings to UNIX style (LF) only so we can consistently
-            # enforce character limits.
-            # https://www.rfc-editor.org/rfc/rfc2046#section-4.1.1
-            q = "\n".join(q.splitlines())
+        try:
+            treq = get_translate_request()
+            if treq["hit"] is not None:
+                return Response(treq["hit"] + "\n", status=200, mimetype="application/x-ndjson")
+
+            response = Response(stream_with_context(stream_chunks(treq)), status=200, mimetype="application/x-ndjson")
+            response.call_on_close(lambda: admission_queue.release(default_timer() - start_t))
+            streaming = True
+            return response
+        finally:
+            if not streaming:
+                admission_queue.release(default_timer() - start_t)
+
+    def stream_chunks(treq):
+        """Lines of a /translate_stream response. Identical requests running
+        at the same time (streamed or not) share a single translation:
+        followers get the chunks of the leader's result at once."""
+        future, leader = flights.claim(treq["flight_key"])
+        if not leader:
+            try:
+                result = future.result()
+            except Exception as e:
+                yield json.dumps({"error": _("Cannot translate text: %(text)s", text=str(e))}, ensure_ascii=False) + "\n"
+                return
 
-        char_limit = get_char_limit(args.char_limit, api_keys_db)
+            for chunk in result_chunks(treq, result):
+                yield json.dumps(chunk, ensure_ascii=False) + "\n"
+            return
 
-        batch = isinstance(q, list)
+        result = None
+        error = Exception("Translation was interrupted")
+        try:
+            for chunk in translate_chunks(treq):
+                if "index" not in chunk:
+                    result = chunk
+                yield json.dumps(chunk, ensure_ascii=False) + "\n"
+            error = None
+        except Exception as e:
+            error = e
+            yield json.dumps({"error": _("Cannot translate text: %(text)s", text=str(e))}, ensure_ascii=False) + "\n"
+        finally:
+            flights.done(treq["flight_key"], future, result, error)
+
+    def result_chunks(treq, result):
+        """Chunks of a complete translation result, as streamed by translate_chunks"""
+        if treq["batch"]:
+            texts_alternatives = result.get("alternatives", [[]] * len(result["translatedText"]))
+            for i, translated_text in enumerate(result["translatedText"]):
+                yield {"index": i, "translatedText": translated_text, "alternatives": texts_alternatives[i]}
+        else:
+            yield {"index": 0, "translatedText": result["translatedText"], "alternatives": result.get("alternatives", [])}
 
-        if batch and args.batch_limit != -1:
-            batch_size = len(q)
-            if args.batch_limit < batch_size:
-                abort(
-                    400,
-                    description=_("Invalid request: request (%(size)s) exceeds text limit (%(limit)s)", size=batch_size, limit=args.batch_limit),
-                )
+        yield result
 
-        src_texts = q if batch else [q]
+    def get_translate_file_request():
+        source_lang = iso2model(request.form.get("source"))
+        target_lang = iso2model(request.form.get("target"))
+        file = request.files['file']
+        char_limit = get_char_limit(args.char_limit, get_auth())
 
-        ak = get_req_api_key()
-        cache_key = None
-        if trans_cache.should_check(ak):
-          cache_key, hit = trans_cache.hit(src_texts, source_lang, target_lang, text_format, num_alternatives)
-          if hit is not None:
-            return Response(hit, status=200, mimetype="application/json")
+        if not file:
+            abort(400, description=_("Invalid request: missing %(name)s parameter", name='file'))
+        if not source_lang:
+            abort(400, description=_("Invalid request: missing %(name)s parameter", name='source'))
+        if not target_lang:
+            abort(400, description=_("Invalid request: missing %(name)s parameter", name='target'))
 
-        if char_limit != -1:
-            for text in src_texts:
-                if len(text) > char_limit:
-                    abort(
-                        400,
-                        description=_("Invalid request: request (%(size)s) exceeds text limit (%(limit)s)", size=len(text), limit=char_limit),
-                    )
+        if file.filename == '':
+            abort(400, description=_("Invalid request: empty file"))
 
-        if batch:
-            request.req_cost = max(1, len(q))
+        if os.path.splitext(file.filename)[1] not in frontend_argos_supported_files_format:
+            abort(400, description=_("Invalid request: file format not supported"))
 
-        translatable = detect_translatable(src_texts)
-        if translatable:
-          if source_lang == "auto":
-              candidate_langs = detect_languages(src_texts)
-              detected_src_lang = candidate_langs[0]
-              src_lang = get_language_with_fallback(detected_src_lang["language"], languages)
-          else:
-              detected_src_lang = {"confidence": 100.0, "language": source_lang}
-              src_lang = next((l for l in languages if l.code == source_lang), None)
-        else:
-          detected_src_lang = {"confidence": 0.0, "language": "en"}
-          src_lang = next((l for l in languages if l.code == "en"), None)
+        registry = get_registry()
+        src_lang = registry.get(source_lang)
 
-        if src_lang is None:
+        if src_lang is None and source_lang != "auto":
             abort(400, description=_("%(lang)s is not supported", lang=source_lang))
 
-        tgt_lang = next((l for l in languages if l.code == target_lang), None)
+        tgt_lang = registry.get(target_lang)
 
         if tgt_lang is None:
-            abort(400, description=_("%(lang)s is not supported",lang=target_lang))
-
-        if not text_format:
-            text_format = "text"
+            abort(400, description=_("%(lang)s is not supported", lang=target_lang))
 
-        if text_format not in ["text", "html"]:
-            abort(400, description=_("%(format)s format is not supported", format=text_format))
+        filename = str(uuid.uuid4()) + '.' + secure_filename(file.filename)
+        filepath = os.path.join(get_upload_dir(), filename)
 
-        try:
-            if batch:
-                batch_results = []
-                batch_alternatives = []
-                for text in q:
-                    translator = src_lang.get_translation(tgt_lang)
-                    if translator is None:
-                        abort(400, description=_("%(tname)s (%(tcode)s) is not available as a target language from %(sname)s (%(scode)s)", tname=_lazy(tgt_lang.name), tcode=tgt_lang.code, sname=_lazy(src_lang.name), scode=src_lang.code))
-
-                    if translatable:
-                      if text_format == "html":
-                          translated_text = unescape(str(translate_html(translator, text)))
-                          alternatives = [] # Not supported for html yet
-                      else:
-                          hypotheses = translator.hypotheses(text, num_alternatives + 1)
-                          translated_text = unescape(improve_translation_formatting(text, hypotheses[0].value))
-                          alternatives = filter_unique([unescape(improve_translation_formatting(text, hypotheses[i].value)) for i in range(1, len(hypotheses))], translated_text)
-                    else:
-                      translated_text = text # Cannot translate, send the original text back
-                      alternatives = []
-
-                    batch_results.append(translated_text)
-                    batch_alternatives.append(alternatives)
-
-                result = {"translatedText": batch_results}
-
-                if source_lang == "auto":
-                    result["detectedLanguage"] = [model2iso(detected_src_lang)] * len(q)
-                if num_alternatives > 0:
-                    result["alternatives"] = batch_alternatives
-            else:
-                translator = src_lang.get_translation(tgt_lang)
-                if translator is None:
-                    abort(400, description=_("%(tname)s (%(tcode)s) is not available as a target language from %(sname)s (%(scode)s)", tname=_lazy(tgt_lang.name), tcode=tgt_lang.code, sname=_lazy(src_lang.name), scode=src_lang.code))
-
-                if translatable:
-                  if text_format == "html":
-                      translated_text = unescape(str(translate_html(translator, q)))
-                      alternatives = [] # Not supported for html yet
-                  else:
-                      hypotheses = translator.hypotheses(q, num_alternatives + 1)
-                      translated_text = unescape(improve_translation_formatting(q, hypotheses[0].value))
-                      alternatives = filter_unique([unescape(improve_translation_formatting(q, hypotheses[i].value)) for i in range(1, len(hypotheses))], translated_text)
-                else:
-                  translated_text = q # Cannot translate, send the original text back
-                  alternatives = []
+        file.save(filepath)
 
-                result = {"translatedText": translated_text}
+        # Not an exact science: take the number of bytes and divide by
+        # the character limit. Assuming a plain text file, this will
+        # set the cost of the request to N = bytes / char_limit, which is
+        # roughly equivalent to a batch process of N batches assuming
+        # each batch uses all available limits
+        if char_limit > 0:
+            request.req_cost = max(1, int(os.path.getsize(filepath) / char_limit))
 
-                if source_lang == "auto":
-                    result["detectedLanguage"] = model2iso(detected_src_lang)
-                if num_alternatives > 0:
-                    result["alternatives"] = alternatives
-            
-            if cache_key is not None:
-              trans_cache.cache(cache_key, result)
+        if source_lang == "auto":
+            src_texts = argostranslatefiles.get_texts(filepath)
+            candidate_langs = detect_languages(src_texts)
+            detected_src_lang = candidate_langs[0]
+            src_lang = registry.get_with_fallback(detected_src_lang["language"])
+            if src_lang is None:
+                abort(400, description=_("%(lang)s is not supported", lang=detected_src_lang["language"]))
 
-            return jsonify(result)
-        except Exception as e:
-            raise e
-            abort(500, description=_("Cannot translate text: %(text)s", text=str(e)))
+        return registry.get_translation(src_lang, tgt_lang), filepath
 
     @bp.post("/translate_file")
     @access_check
+    @admission_check
     def translate_file():
         """
         Translate a File
@@ -965,57 +1431,10 @@ def create_app(args):
         if args.disable_files_translation:
             abort(403, description=_("Files translation are disabled on this server."))
 
-        source_lang = iso2model(request.form.get("source"))
-        target_lang = iso2model(request.form.get("target"))
-        file = request.files['file']
-        char_limit = get_char_limit(args.char_limit, api_keys_db)
-
-        if not file:
-            abort(400, description=_("Invalid request: missing %(name)s parameter", name='file'))
-        if not source_lang:
-            abort(400, description=_("Invalid request: missing %(name)s parameter", name='source'))
-        if not target_lang:
-            abort(400, description=_("Invalid request: missing %(name)s parameter", name='target'))
-
-        if file.filename == '':
-            abort(400, description=_("Invalid request: empty file"))
-
-        if os.path.splitext(file.filename)[1] not in frontend_argos_supported_files_format:
-            abort(400, description=_("Invalid request: file format not supported"))
-
-        src_lang = next((l for l in languages if l.code == source_lang), None)
-
-        if src_lang is None and source_lang != "auto":
-            abort(400, description=_("%(lang)s is not supported", lang=source_lang))
-
-        tgt_lang = next((l for l in languages if l.code == target_lang), None)
-
-        if tgt_lang is None:
-            abort(400, description=_("%(lang)s is not supported", lang=target_lang))
-
         try:
-            filename = str(uuid.uuid4()) + '.' + secure_filename(file.filename)
-            filepath = os.path.join(get_upload_dir(), filename)
-
-            file.save(filepath)
-
-            # Not an exact science: take the number of bytes and divide by
-            # the character limit. Assuming a plain text file, this will
-            # set the cost of the request to N = bytes / char_limit, which is
-            # roughly equivalent to a batch process of N batches assuming
-            # each batch uses all available limits
-            if char_limit > 0:
-                request.req_cost = max(1, int(os.path.getsize(filepath) / char_limit))
-
-            if source_lang == "auto":
-                src_texts = argostranslatefiles.get_texts(filepath)
-                candidate_langs = detect_languages(src_texts)
-                detected_src_lang = candidate_langs[0]
-                src_lang = get_language_with_fallback(detected_src_lang["language"], languages)
-                if src_lang is None:
-                    abort(400, description=_("%(lang)s is not supported", lang=detected_src_lang["language"]))
-
-            translated_file_path = argostranslatefiles.translate_file(src_lang.get_translation(tgt_lang), filepath)
+            translation, filepath = get_translate_file_request()
+            with residency.lease(translation):
+                translated_file_path = argostranslatefiles.translate_file(translation, filepath)
             translated_filename = os.path.basename(translated_file_path)
 
             return jsonify(
@@ -1023,6 +1442,8 @@ def create_app(args):
                     "translatedFileUrl": url_for('Main app.download_file', filename=translated_filename, _external=True)
                 }
             )
+        except HTTPException as e:
+            raise e
         except Exception as e:
             abort(500, description=e)
 
@@ -1053,8 +1474,243 @@ def create_app(args):
 
         return send_file(return_data, as_attachment=True, download_name=download_filename)
 
+    @bp.post("/jobs")
+    @access_check
+    def create_job():
+        """
+        Queue a Translation Job
+        ---
+        tags:
+          - translate
+        consumes:
+         - multipart/form-data
+         - application/json
+        parameters:
+          - in: formData
+            name: file
+            type: file
+            required: false
+            description: File to translate. Either file or q must be set
+          - in: formData
+            name: q
+            schema:
+              oneOf:
+                - type: string
+                  example: Hello world!
+                - type: array
+                  example: ['Hello world!']
+            required: false
+            description: Text(s) to translate. Either file or q must be set
+          - in: formData
+            name: source
+            schema:
+              type: string
+              example: en
+            required: true
+            description: Source language code or "auto" for auto detection
+          - in: formData
+            name: target
+            schema:
+              type: string
+              example: es
+            required: true
+            description: Target language code
+          - in: formData
+            name: format
+            schema:
+              type: string
+              enum: [text, html]
+              default: text
+              example: text
+            required: false
+            description: Format of source text (ignored for files)
+          - in: formData
+            name: alternatives
+            schema:
+              type: integer
+              default: 0
+              example: 3
+            required: false
+            description: Preferred number of alternative translations (ignored for files)
+          - in: formData
+            name: api_key
+            schema:
+              type: string
+              example: xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx
+            required: false
+            description: API key
+        responses:
+          202:
+            description: Job queued
+            schema:
+              id: job
+              type: object
+              properties:
+                id:
+                  type: string
+                  description: Job ID
+                status:
+                  type: string
+                  enum: [queued, running, done, error]
+                  description: Job status
+                progress:
+                  type: object
+                  properties:
+                    done:
+                      type: integer
+                      description: Number of translated texts (text jobs) or segments (file jobs)
+                    total:
+                      type: integer
+                      description: Total number of texts or segments, if known
+                result:
+                  type: object
+                  description: Translation, in the same format as /translate (text jobs)
+                translatedFileUrl:
+                  type: string
+                  description: Translated file url (file jobs)
+                error:
+                  type: string
+                  description: Error message, if the job failed
+          400:
+            description: Invalid request
+            schema:
+              id: error-response
+              type: object
+              properties:
+                error:
+                  type: string
+                  description: Error message
+          429:
+            description: Slow down
+            schema:
+              id: error-slow-down
+              type: object
+              properties:
+                error:
+                  type: string
+                  description: Reason for slow down
+          403:
+            description: Banned
+            schema:
+              id: error-response
+              type: object
+              properties:
+                error:
+                  type: string
+                  description: Error message
+          503:
+            description: Too many queued jobs
+            schema:
+              id: error-response
+              type: object
+              properties:
+                error:
+                  type: string
+                  description: Error message
+        """
+        if 'file' in request.files:
+            if args.disable_files_translation:
+                abort(403, description=_("Files translation are disabled on this server."))
+
+            translation, filepath = get_translate_file_request()
+
+            def run(job):
+                with residency.lease(translation):
+                    translated_file_path = argostranslatefiles.translate_file(jobs.ProgressTranslation(translation, job), filepath)
+                return {"translatedFilename": os.path.basename(translated_file_path)}
+
+            if job_manager.is_full():
+                os.remove(filepath)
+                abort(503, description=_("Too many queued jobs, please try again later"), retry_after=60)
+            total = jobs.count_file_segments(translation, filepath)
+        else:
+            treq = get_translate_request()
+
+            if treq["hit"] is not None:
+                hit = treq["hit"]
+                def run(job):
+                    job.advance()
+                    return json.loads(hit)
+                total = 1
+            else:
+                def run(job):
+                    src_texts = treq["src_texts"]
+                    item_translators = treq["item_translators"]
+                    translated_texts = []
+                    texts_alternatives = []
+                    for start in range(0, len(src_texts), jobs.CHUNK_SIZE):
+                        end = start + jobs.CHUNK_SIZE
+                        translated, alternatives = translate_items(dict(treq,
+                            src_texts=src_texts[start:end],
+                            item_translators=item_translators[start:end] if item_translators is not None else None,
+                        ))
+                        translated_texts += translated
+                        texts_alternatives += alternatives
+                        job.advance(len(translated))
+
+                    result = get_translate_result(treq, translated_texts, texts_alternatives)
+                    if treq["cache_key"] is not None:
+                        trans_cache.cache(treq["cache_key"], result)
+                    return result
+                total = len(treq["src_texts"])
+
+        try:
+            job = job_manager.submit(run, total)
+        except jobs.JobQueueFullError:
+            if 'file' in request.files:
+                os.remove(filepath)
+            abort(503, description=_("Too many queued jobs, please try again later"), retry_after=60)
+
+        return jsonify(get_job_response(job.to_dict())), 202
+
+    @bp.get("/jobs/<string:job_id>")
+    @limiter.exempt
+    def get_job(job_id: str):
+        """
+        Get the Status of a Translation Job
+        ---
+        tags:
+          - translate
+        parameters:
+          - in: path
+            name: job_id
+            schema:
+              type: string
+            required: true
+            description: Job ID
+        responses:
+          200:
+            description: Job status
+            schema:
+              id: job
+          404:
+            description: Job not found
+            schema:
+              id: error-response
+              type: object
+              properties:
+                error:
+                  type: string
+                  description: Error message
+        """
+        job = job_manager.get(job_id)
+        if job is None:
+            return jsonify({"error": _("Job not found")}), 404
+
+        return jsonify(get_job_response(job))
+
+    def get_job_response(job):
+        result = job.pop("result")
+        if result is not None:
+            if "translatedFilename" in result:
+                job["translatedFileUrl"] = url_for('Main app.download_file', filename=result["translatedFilename"], _external=True)
+            else:
+                job["result"] = result
+        return job
+
     @bp.post("/detect")
     @access_check
+    @admission_check
     def detect():
         """
         Detect Language of Text
@@ -0,0 +1,193 @@
+import ctranslate2
+from argostranslate import settings
+from argostranslate.translate import (
+    CachedTranslation,
+    CompositeTranslation,
+    Hypothesis,
+    ITranslation,
+    PackageTranslation,
+)
+
+from libretranslate.cache import get_segment_cache
+from libretranslate.residency import get_residency, lease
+
+decode_max_tokens = -1
+
+
+def batch_hypotheses(translation, texts, num_hypotheses=1):
+    """Translate a list of texts, returning a list of hypotheses for each text.
+
+    Unlike calling translation.hypotheses for each text, the sentences
+    of all texts are sent to the model with a single decode call.
+    """
+    if isinstance(translation, CachedTranslation):
+        # The argos cache only remembers the paragraphs of the previous call,
+        # which is of no use (and not thread safe) for batches
+        translation = translation.underlying
+
+    if isinstance(translation, PackageTranslation):
+        return package_hypotheses(translation, texts, num_hypotheses)
+    elif isinstance(translation, CompositeTranslation):
+        return composite_hypotheses(translation, texts, num_hypotheses)
+    else:
+        return [translation.hypotheses(text, num_hypotheses) for text in texts]
+
+
+def load_translator(translation):
+    """The model of translation, loading it if needed.
+    Callers should hold a residency lease while using it."""
+    translator = translation.translator
+    if translator is None:
+        params = {
+            "model_path": str(translation.pkg.package_path / "model"),
+            "device": settings.device,
+            "inter_threads": settings.inter_threads,
+            "intra_threads": settings.intra_threads,
+        }
+        if settings.compute_type != "auto":
+            params["compute_type"] = settings.compute_type
+        translator = ctranslate2.Translator(**params)
+        translation.translator = translator
+
+    residency = get_residency()
+    if residency is not None:
+        residency.touch(translation)
+
+    return translator
+
+
+def translate_sentences(translation, sentences, num_hypotheses):
+    """Translate the sentences, returning (tokens, scores) pairs,
+    one per sentence, each holding num_hypotheses entries.
+    Sentences found in the segment cache are not sent to the model."""
+    segments = get_segment_cache()
+    translated = [None] * len(sentences)
+
+    # Unique sentences that still need to be decoded
+    pending = {}
+    for i, sentence in enumerate(sentences):
+        key = segments.key(translation, sentence, num_hypotheses) if segments is not None else i
+        hit = segments.get(key) if segments is not None else None
+        if hit is not None:
+            translated[i] = hit
+        else:
+            pending.setdefault(key, []).append(i)
+
+    if pending:
+        keys = list(pending)
+        decoded = decode_sentences(translation, [sentences[pending[k][0]] for k in keys], num_hypotheses)
+        for key, result in zip(keys, decoded):
+            if segments is not None:
+                segments.set(key, result)
+            for i in pending[key]:
+                translated[i] = result
+
+    return translated
+
+
+def decode_sentences(translation, sentences, num_hypotheses):
+    pkg = translation.pkg
+    tokenized = [pkg.tokenizer.encode(sentence) for sentence in sentences]
+    return decode_tokenized(translation, tokenized, num_hypotheses)
+
+
+def decode_tokenized(translation, tokenized, num_hypotheses):
+    pkg = translation.pkg
+    target_prefix = None
+    if pkg.target_prefix != "":
+        target_prefix = [[pkg.target_prefix]] * len(tokenized)
+
+    with lease(translation):
+        results = load_translator(translation).translate_batch(
+            tokenized,
+            target_prefix=target_prefix,
+            replace_unknowns=True,
+            # CTranslate2 sorts the sentences by length and splits them
+            # into batches of at most this many tokens, or of
+            # ARGOS_BATCH_SIZE sentences like argostranslate does
+            max_batch_size=decode_max_tokens if decode_max_tokens > 0 else settings.batch_size,
+            batch_type="tokens" if decode_max_tokens > 0 else "examples",
+            beam_size=max(num_hypotheses, settings.beam_size),
+            num_hypotheses=num_hypotheses,
+            length_penalty=0.2,
+            return_scores=True,
+        )
+
+    return [(r.hypotheses, r.scores) for r in results]
+
+
+def decode_tokens(pkg, tokens):
+    value = pkg.tokenizer.decode(tokens)
+
+    if pkg.target_prefix != "" and value.startswith(pkg.target_prefix):
+        # Remove target prefix
+        value = value[len(pkg.target_prefix):]
+
+    if len(value) > 0 and value[0] == " ":
+        # Remove space at the beginning of the translation added
+        # by the tokenizer.
+        value = value[1:]
+
+    return value
+
+
+def package_hypotheses(translation, texts, num_hypotheses):
+    # Split every text into paragraphs and sentences, remembering
+    # which range of sentences belongs to which paragraph
+    sentences = []
+    layout = []
+    for text in texts:
+        paragraphs = []
+        for paragraph in ITranslation.split_into_paragraphs(text):
+            start = len(sentences)
+            sentences.extend(translation.sentencizer.split_sentences(paragraph))
+            paragraphs.append((start, len(sentences)))
+        layout.append(paragraphs)
+
+    translated = translate_sentences(translation, sentences, num_hypotheses)
+
+    # Reassemble hypotheses the same way argostranslate does
+    results = []
+    for paragraphs in layout:
+        hypotheses = [Hypothesis("", 0) for i in range(num_hypotheses)]
+        for start, end in paragraphs:
+            for i in range(num_hypotheses):
+                tokens = []
+                score = 0
+                for sentence_tokens, sentence_scores in translated[start:end]:
+                    tokens.extend(sentence_tokens[i])
+                    score += sentence_scores[i]
+
+                value = ITranslation.combine_paragraphs([hypotheses[i].value, decode_tokens(translation.pkg, tokens)])
+                hypotheses[i] = Hypothesis(value, hypotheses[i].score + score)
+
+        for h in hypotheses:
+            h.value = h.value.lstrip("\n")
+        results.append(hypotheses)
+
+    return results
+
+
+def composite_hypotheses(translation, texts, num_hypotheses):
+    t1_results = batch_hypotheses(translation.t1, texts, num_hypotheses)
+
+    # Pivot all intermediate hypotheses at once
+    pivot_texts = [h.value for t1_hypotheses in t1_results for h in t1_hypotheses]
+    t2_results = iter(batch_hypotheses(translation.t2, pivot_texts, num_hypotheses))
+
+    results = []
+    for t1_hypotheses in t1_results:
+        hypotheses = []
+        for t1_hypothesis in t1_hypotheses:
+            for t2_hypothesis in next(t2_results):
+                hypotheses.append(Hypothesis(t2_hypothesis.value, t1_hypothesis.score + t2_hypothesis.score))
+        hypotheses.sort(reverse=True)
+        results.append(hypotheses[0:num_hypotheses])
+
+    return results
+
+
+def setup(max_tokens):
+    global decode_max_tokens
+
+    decode_max_tokens = max_tokens
@@ -1,29 +1,99 @@
+from libretranslate.detect import Language
 from libretranslate.storage import get_storage
+from expiringdict import ExpiringDict
+from collections import OrderedDict
 import hashlib
 import json
 import gzip
+import threading
+import time
 
 cache = None
 def get_translation_cache():
     return cache
 
+segment_cache = None
+def get_segment_cache():
+    return segment_cache
+
+detection_cache = None
+def get_detection_cache():
+    return detection_cache
+
+class LRUCache:
+    """Dict-like cache keeping at most max_len entries for at most
+    max_age seconds, evicting the least recently used first"""
+
+    def __init__(self, max_len, max_age):
+        self.max_len = max_len
+        self.max_age = max_age
+        self.data = OrderedDict() # key --> (value, expires at)
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is None:
+                return default
+
+            if entry[1] <= time.time():
+                del self.data[key]
+                return default
+
+            self.data.move_to_end(key)
+            return entry[0]
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            self.data[key] = (value, time.time() + self.max_age)
+            self.data.move_to_end(key)
+            while len(self.data) > self.max_len:
+                self.data.popitem(last=False)
+
+    def __len__(self):
+        return len(self.data)
+
 class TranslationCache:
-    def __init__(self, translation_cache_aks):
+    def __init__(self, translation_cache_aks, l1_max_len=0, l1_max_age=300):
         self.enabled = len(translation_cache_aks) > 0
         self.api_keys = [ak for ak in translation_cache_aks if ak.lower() != "all"]
         self.cache_all = "all" in [ak.lower() for ak in translation_cache_aks]
         self.expire = 604800 # 7 days
         self.storage = get_storage()
 
+        # In-process cache of the most recent entries, in front of the storage
+        self.l1 = LRUCache(l1_max_len, l1_max_age) if l1_max_len > 0 else None
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.misses = 0
+        self.lookups_counter = None
+
         assert self.storage is not None, "Storage is none"
 
     def should_check(self, ak):
         return self.enabled and (self.cache_all or ak in self.api_keys)
 
-    def hit(self, src_texts, source_lang, target_lang, text_format, num_alternatives):
-        text_blob = "|".join(src_texts) if isinstance(src_texts, list) else src_texts
+    def count(self, result):
+        if self.lookups_counter is not None:
+            self.lookups_counter.labels(result).inc()
+
+    def key(self, q, source_lang, target_lang, text_format, num_alternatives):
+        # JSON keeps "a|b" and ["a", "b"] apart
+        text_blob = json.dumps(q, ensure_ascii=False)
         fingerprint = f"{text_blob}:{source_lang}:{target_lang}:{text_format}:{num_alternatives}"
-        cache_key = "tcache_" + hashlib.md5(fingerprint.encode('utf-8')).hexdigest()
+        return "tcache_" + hashlib.md5(fingerprint.encode('utf-8')).hexdigest()
+
+    def hit(self, q, source_lang, target_lang, text_format, num_alternatives):
+        cache_key = self.key(q, source_lang, target_lang, text_format, num_alternatives)
+        return cache_key, self.get(cache_key)
+
+    def get(self, cache_key):
+        if self.l1 is not None:
+            cached = self.l1.get(cache_key)
+            if cached is not None:
+                self.l1_hits += 1
+                self.count("l1")
+                return cached
 
         cached = self.storage.get_str(cache_key, raw=True)
         if len(cached) == 0:
@@ -32,10 +102,19 @@ class TranslationCache:
         if cached is not None:
             try:
                 cached = gzip.decompress(cached).decode('utf-8')
+                if self.l1 is not None:
+                    self.l1[cache_key] = cached
             except Exception as e:
                 print(str(e))
 
-        return cache_key, cached
+        if cached is None:
+            self.misses += 1
+            self.count("miss")
+        else:
+            self.l2_hits += 1
+            self.count("l2")
+
+        return cached
 
     def cache(self, cache_key, content):
         try:
@@ -44,11 +123,123 @@ class TranslationCache:
                 compressed = gzip.compress(content.encode('utf-8'))
                 
             self.storage.set_str(cache_key, compressed, self.expire)
+
+            if self.l1 is not None:
+                self.l1[cache_key] = content
         except Exception as e:
             print(str(e))
 
-def setup(translation_cache_aks):
+def setup(translation_cache_aks, l1_max_len=0, l1_max_age=300):
     global cache
     
-    cache = TranslationCache(translation_cache_aks)
-    return cache
\ No newline at end of file
+    cache = TranslationCache(translation_cache_aks, l1_max_len, l1_max_age)
+    return cache
+
+class SegmentCache:
+    def __init__(self, max_len, max_age=604800):
+        self.enabled = max_len > 0
+        self.store = ExpiringDict(max_len=max(1, max_len), max_age_seconds=max_age)
+
+    def key(self, translation, sentence, num_hypotheses):
+        # Whitespace is normalized by the tokenizer anyway
+        normalized = " ".join(sentence.split())
+        return f"{translation.from_lang.code}:{translation.to_lang.code}:{num_hypotheses}:{normalized}"
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        return self.store.get(key)
+
+    def set(self, key, translated):
+        if self.enabled:
+            self.store[key] = translated
+
+def setup_segments(max_len):
+    global segment_cache
+
+    segment_cache = SegmentCache(max_len)
+    return segment_cache
+
+class DetectionCache:
+    """Language detection results for single texts, keyed by a hash of
+    the whitespace normalized text and of the loaded languages.
+    Optionally backed by the shared storage."""
+
+    def __init__(self, max_len, use_storage=False, max_age=604800):
+        self.enabled = max_len > 0
+        self.store = ExpiringDict(max_len=max(1, max_len), max_age_seconds=max_age)
+        self.expire = max_age
+        self.storage = get_storage() if use_storage else None
+        self.hits = 0
+        self.misses = 0
+        self.lookups_counter = None
+
+    def key(self, text, langcodes):
+        normalized = " ".join(text.split())
+        fingerprint = f"{','.join(langcodes)}:{normalized}"
+        return "dcache_" + hashlib.md5(fingerprint.encode('utf-8')).hexdigest()
+
+    def get_many(self, keys):
+        """Returns the cached detections of keys (None when missing),
+        with a single storage round trip for the keys not in memory"""
+        detections = [self.store.get(key) for key in keys]
+
+        missing = [i for i, detected in enumerate(detections) if detected is None]
+        if missing and self.storage is not None:
+            try:
+                stored = self.storage.get_many([keys[i] for i in missing])
+                for i, value in zip(missing, stored):
+                    if value:
+                        detections[i] = [tuple(d) for d in json.loads(value)]
+                        self.store[keys[i]] = detections[i]
+            except Exception as e:
+                print(str(e))
+
+        for detected in detections:
+            if detected is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            if self.lookups_counter is not None:
+                self.lookups_counter.labels("miss" if detected is None else "hit").inc()
+
+        return detections
+
+    def set_many(self, mapping):
+        for key, detected in mapping.items():
+            self.store[key] = detected
+
+        if self.storage is not None:
+            try:
+                self.storage.set_many({key: json.dumps(detected) for key, detected in mapping.items()}, self.expire)
+            except Exception as e:
+                print(str(e))
+
+    def detect_batch(self, detector, texts):
+        """Same as detector.detect_batch, only detecting texts not found in the cache"""
+        if not self.enabled:
+            return detector.detect_batch(texts)
+
+        keys = [self.key(text, detector.langcodes) for text in texts]
+        unique_keys = list(dict.fromkeys(keys))
+        cached = dict(zip(unique_keys, self.get_many(unique_keys)))
+
+        pending = [key for key in unique_keys if cached[key] is None]
+        if pending:
+            first = {}
+            for text, key in zip(texts, keys):
+                first.setdefault(key, text)
+
+            detections = detector.detect_batch([first[key] for key in pending])
+            detected = {key: [(l.code, l.confidence) for l in d] for key, d in zip(pending, detections)}
+            self.set_many(detected)
+            cached.update(detected)
+
+        # Callers modify the returned objects, always hand out new ones
+        return [[Language(code, confidence) for code, confidence in cached[key]] for key in keys]
+
+def setup_detection(max_len, use_storage):
+    global detection_cache
+
+    detection_cache = DetectionCache(max_len, use_storage)
+    return detection_cache
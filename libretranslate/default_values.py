@@ -91,6 +91,41 @@ _default_options_objects = [
         'default_value': -1,
         'value_type': 'int'
     },
+    {
+        'name': 'BATCH_WINDOW',
+        'default_value': 0,
+        'value_type': 'int'
+    },
+    {
+        'name': 'BATCH_MAX_TOKENS',
+        'default_value': 2048,
+        'value_type': 'int'
+    },
+    {
+        'name': 'DECODE_MAX_TOKENS',
+        'default_value': -1,
+        'value_type': 'int'
+    },
+    {
+        'name': 'MAX_CONCURRENCY',
+        'default_value': -1,
+        'value_type': 'int'
+    },
+    {
+        'name': 'MAX_QUEUE_DEPTH',
+        'default_value': 16,
+        'value_type': 'int'
+    },
+    {
+        'name': 'MAX_QUEUE_WAIT',
+        'default_value': 10,
+        'value_type': 'int'
+    },
+    {
+        'name': 'ADAPTIVE_CONCURRENCY',
+        'default_value': False,
+        'value_type': 'bool'
+    },
     {
         'name': 'DEBUG',
         'default_value': False,
@@ -191,6 +226,16 @@ _default_options_objects = [
         'default_value': -1,
         'value_type': 'int'
     },
+    {
+        'name': 'MODEL_MEMORY_BUDGET',
+        'default_value': -1,
+        'value_type': 'int'
+    },
+    {
+        'name': 'MODEL_IDLE_TTL',
+        'default_value': -1,
+        'value_type': 'int'
+    },
     {
         'name': 'THREADS',
         'default_value': 4,
@@ -211,6 +256,16 @@ _default_options_objects = [
         'default_value': False,
         'value_type': 'bool'
     },
+    {
+        'name': 'JOB_WORKERS',
+        'default_value': 1,
+        'value_type': 'int'
+    },
+    {
+        'name': 'JOB_QUEUE_LIMIT',
+        'default_value': 100,
+        'value_type': 'int'
+    },
     {
         'name': 'DISABLE_WEB_UI',
         'default_value': False,
@@ -241,6 +296,31 @@ _default_options_objects = [
         'default_value': '',
         'value_type': 'str'
     },
+    {
+        'name': 'TRANSLATION_CACHE_L1',
+        'default_value': 1000,
+        'value_type': 'int'
+    },
+    {
+        'name': 'TRANSLATION_CACHE_L1_TTL',
+        'default_value': 300,
+        'value_type': 'int'
+    },
+    {
+        'name': 'SEGMENT_CACHE',
+        'default_value': 0,
+        'value_type': 'int'
+    },
+    {
+        'name': 'DETECTION_CACHE',
+        'default_value': 10000,
+        'value_type': 'int'
+    },
+    {
+        'name': 'DETECTION_CACHE_STORAGE',
+        'default_value': False,
+        'value_type': 'bool'
+    },
     {
         'name': 'URL_PREFIX',
         'default_value': '',
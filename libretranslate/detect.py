@@ -1,10 +1,10 @@
 
-from langdetect import DetectorFactory
+from bisect import bisect_right
+from functools import lru_cache
 
-DetectorFactory.seed = 0
-
-from langdetect import detect_langs, LangDetectException
-from langdetect.lang_detect_exception import ErrorCode
+import numpy as np
+from langdetect import detector_factory
+from langdetect.utils.ngram import NGram
 from lexilang.detector import detect as lldetect
 
 
@@ -16,11 +16,140 @@ class Language:
   def __str__(self):
     return (f"code: {self.code:<9} confidence: {self.confidence:>5.1f} ")
 
-def check_lang(langcodes, lang):
-  return normalized_lang_code(lang) in langcodes
+# (first code point, last code point, script)
+SCRIPT_RANGES = sorted([
+  (0x0041, 0x005A, "Latin"),
+  (0x0061, 0x007A, "Latin"),
+  (0x00C0, 0x024F, "Latin"),
+  (0x1E00, 0x1EFF, "Latin"),
+  (0x0370, 0x03FF, "Greek"),
+  (0x1F00, 0x1FFF, "Greek"),
+  (0x0400, 0x052F, "Cyrillic"),
+  (0x0530, 0x058F, "Armenian"),
+  (0x0590, 0x05FF, "Hebrew"),
+  (0x0600, 0x06FF, "Arabic"),
+  (0x0750, 0x077F, "Arabic"),
+  (0xFB50, 0xFDFF, "Arabic"),
+  (0xFE70, 0xFEFF, "Arabic"),
+  (0x0900, 0x097F, "Devanagari"),
+  (0x0980, 0x09FF, "Bengali"),
+  (0x0A00, 0x0A7F, "Gurmukhi"),
+  (0x0A80, 0x0AFF, "Gujarati"),
+  (0x0B00, 0x0B7F, "Oriya"),
+  (0x0B80, 0x0BFF, "Tamil"),
+  (0x0C00, 0x0C7F, "Telugu"),
+  (0x0C80, 0x0CFF, "Kannada"),
+  (0x0D00, 0x0D7F, "Malayalam"),
+  (0x0D80, 0x0DFF, "Sinhala"),
+  (0x0E00, 0x0E7F, "Thai"),
+  (0x0E80, 0x0EFF, "Lao"),
+  (0x0F00, 0x0FFF, "Tibetan"),
+  (0x1000, 0x109F, "Myanmar"),
+  (0x10A0, 0x10FF, "Georgian"),
+  (0x1100, 0x11FF, "Hangul"),
+  (0x3130, 0x318F, "Hangul"),
+  (0xAC00, 0xD7AF, "Hangul"),
+  (0x1200, 0x139F, "Ethiopic"),
+  (0x1780, 0x17FF, "Khmer"),
+  (0x1800, 0x18AF, "Mongolian"),
+  (0x3040, 0x30FF, "Kana"),
+  (0x31F0, 0x31FF, "Kana"),
+  (0xFF66, 0xFF9F, "Kana"),
+  (0x3400, 0x4DBF, "Han"),
+  (0x4E00, 0x9FFF, "Han"),
+  (0xF900, 0xFAFF, "Han"),
+])
+SCRIPT_STARTS = [r[0] for r in SCRIPT_RANGES]
+
+# Scripts of languages not written (only) in Latin script
+LANGUAGE_SCRIPTS = {
+  "am": ("Ethiopic",),
+  "ar": ("Arabic",),
+  "as": ("Bengali",),
+  "be": ("Cyrillic",),
+  "bg": ("Cyrillic",),
+  "bn": ("Bengali",),
+  "bo": ("Tibetan",),
+  "ckb": ("Arabic",),
+  "dz": ("Tibetan",),
+  "el": ("Greek",),
+  "fa": ("Arabic",),
+  "gu": ("Gujarati",),
+  "he": ("Hebrew",),
+  "hi": ("Devanagari",),
+  "hy": ("Armenian",),
+  "ja": ("Kana", "Han"),
+  "ka": ("Georgian",),
+  "kk": ("Cyrillic",),
+  "km": ("Khmer",),
+  "kn": ("Kannada",),
+  "ko": ("Hangul",),
+  "ky": ("Cyrillic",),
+  "lo": ("Lao",),
+  "mk": ("Cyrillic",),
+  "ml": ("Malayalam",),
+  "mn": ("Cyrillic", "Mongolian"),
+  "mr": ("Devanagari",),
+  "my": ("Myanmar",),
+  "ne": ("Devanagari",),
+  "or": ("Oriya",),
+  "pa": ("Gurmukhi",),
+  "ps": ("Arabic",),
+  "ru": ("Cyrillic",),
+  "sa": ("Devanagari",),
+  "sd": ("Arabic",),
+  "si": ("Sinhala",),
+  "sr": ("Cyrillic", "Latin"),
+  "ta": ("Tamil",),
+  "te": ("Telugu",),
+  "tg": ("Cyrillic",),
+  "th": ("Thai",),
+  "ti": ("Ethiopic",),
+  "tt": ("Cyrillic",),
+  "ug": ("Arabic",),
+  "uk": ("Cyrillic",),
+  "ur": ("Arabic",),
+  "yi": ("Hebrew",),
+  "zh": ("Han",),
+  "zt": ("Han",),
+}
+
+def char_script(ch):
+  cp = ord(ch)
+  i = bisect_right(SCRIPT_STARTS, cp) - 1
+  if i >= 0 and cp <= SCRIPT_RANGES[i][1]:
+    return SCRIPT_RANGES[i][2]
+  return None
+
+def text_script(text):
+  """Returns the script most letters of the text are written in"""
+  counts = {}
+  for ch in text:
+    script = char_script(ch)
+    if script is not None:
+      counts[script] = counts.get(script, 0) + 1
+
+  if not counts:
+    return None
+
+  # Japanese and Korean text mix Han characters with kana / hangul
+  if "Kana" in counts and "Han" in counts:
+    counts["Kana"] += counts.pop("Han")
+  if "Hangul" in counts and "Han" in counts:
+    counts["Hangul"] += counts.pop("Han")
+
+  return max(counts, key=counts.get)
+
+@lru_cache(maxsize=None)
+def get_script_table(langcodes):
+  """Maps every script to the loaded languages written in it"""
+  table = {}
+  for code in langcodes:
+    for script in LANGUAGE_SCRIPTS.get(code, ("Latin",)):
+      table.setdefault(script, []).append(code)
+  return {script: tuple(codes) for script, codes in table.items()}
 
-def normalized_lang_code(lang):
-  code = lang.lang
+def normalized_lang_code(code):
   # Handle Chinese
   if code == "zh-cn":
     code = "zh"
@@ -28,27 +157,138 @@ def normalized_lang_code(lang):
     code = "zt"
   return code
 
+class NgramModel:
+  """The langdetect n-gram profiles, restricted to langcodes and compiled
+  into a matrix of log probabilities (one row per n-gram, one column per language).
+
+  Instead of langdetect's randomized sampling of n-grams, every n-gram of a
+  text is scored at once, and whole batches of texts are scored together."""
+
+  # Same smoothing as langdetect (ALPHA_DEFAULT / BASE_FREQ)
+  SMOOTHING = 0.5 / 10000
+
+  # Number of n-grams whose log probabilities are summed, longer texts
+  # use the average log probability of their n-grams instead
+  MAX_EVIDENCE = 30
+
+  def __init__(self, langcodes):
+    detector_factory.init_factory()
+    self.factory = detector_factory._factory
+
+    columns = [i for i, lang in enumerate(self.factory.langlist) if normalized_lang_code(lang) in langcodes]
+    self.codes = [normalized_lang_code(self.factory.langlist[i]) for i in columns]
+
+    self.index = {}
+    rows = []
+    for ngram, probs in self.factory.word_lang_prob_map.items():
+      row = [probs[i] for i in columns]
+      if any(row):
+        self.index[ngram] = len(rows)
+        rows.append(row)
+
+    self.log_probs = np.log(np.array(rows, dtype=np.float32).reshape(len(rows), len(self.codes)) + self.SMOOTHING)
+
+  def extract_ngrams(self, text):
+    # Same text cleanup as langdetect
+    detector = self.factory.create()
+    detector.append(text)
+    detector.cleaning_text()
+
+    rows = []
+    ngram = NGram()
+    for ch in detector.text:
+      ngram.add_char(ch)
+      if ngram.capitalword:
+        continue
+      for n in range(1, NGram.N_GRAM + 1):
+        if len(ngram.grams) < n:
+          break
+        w = ngram.grams[-n:]
+        if w and w != ' ':
+          row = self.index.get(w)
+          if row is not None:
+            rows.append(row)
+    return rows
+
+  def probabilities(self, texts, langcodes=None):
+    """Returns the list of language codes and a (texts x languages)
+    matrix of probabilities. Rows of texts without any known n-gram
+    are all zeros. When langcodes is set, only those languages are considered."""
+    columns = list(range(len(self.codes)))
+    if langcodes is not None:
+      columns = [j for j in columns if self.codes[j] in langcodes] or columns
+    codes = [self.codes[j] for j in columns]
+
+    rows = []
+    owners = []
+    for i, text in enumerate(texts):
+      text_rows = self.extract_ngrams(text)
+      rows.extend(text_rows)
+      owners.extend([i] * len(text_rows))
+
+    scores = np.zeros((len(texts), len(codes)), dtype=np.float32)
+    if not codes:
+      return codes, scores
+    np.add.at(scores, np.array(owners, dtype=np.intp), self.log_probs[np.array(rows, dtype=np.intp)][:, columns])
+
+    # Summed over hundreds of n-grams, score differences are so large that the
+    # softmax is always (nearly) 100% sure, even for texts mixing languages.
+    # Like langdetect stops updating once sure enough, count at most
+    # MAX_EVIDENCE n-grams worth of log probability per text.
+    counts = np.bincount(np.array(owners, dtype=np.intp), minlength=len(texts))
+    scores *= np.minimum(1, self.MAX_EVIDENCE / np.maximum(counts, 1))[:, None]
+
+    # Softmax over languages
+    probs = np.exp(scores - scores.max(axis=1, keepdims=True))
+    probs /= probs.sum(axis=1, keepdims=True)
+
+    found = np.zeros(len(texts), dtype=bool)
+    found[owners] = True
+    probs[~found] = 0
+    return codes, probs
+
+@lru_cache(maxsize=None)
+def get_ngram_model(langcodes):
+  return NgramModel(langcodes)
+
 class Detector:
+  PROB_THRESHOLD = 0.1
+
   def __init__(self, langcodes = ()):
     self.langcodes = langcodes
 
   def detect(self, text):
-    if len(text) < 20:
-      code, conf = lldetect(text, self.langcodes)
-      if conf > 0:
-        return [Language(code, round(conf * 100))]
-
-    try:
-      top_3_choices = [lang for lang in detect_langs(text) if check_lang(self.langcodes, lang)][:3]
-      if not len(top_3_choices):
-        return [Language("en", 0)]
-      if top_3_choices[0].prob == 0:
-        return [Language("en", 0)]
-    except LangDetectException as e:
-      if e.code == ErrorCode.CantDetectError:
-        return [Language("en", 0)]
-      else:
-        raise e
-
-    return [Language(normalized_lang_code(lang), round(lang.prob * 100)) for lang in top_3_choices]
+    return self.detect_batch([text])[0]
+
+  def detect_batch(self, texts):
+    results = [None] * len(texts)
+    scripts = get_script_table(tuple(self.langcodes))
+
+    # Texts pending n-gram scoring, grouped by candidate languages
+    pending = {}
+    for i, text in enumerate(texts):
+      candidates = scripts.get(text_script(text))
+      if candidates is not None and len(candidates) == 1:
+        # Only one loaded language is written in this script
+        results[i] = [Language(candidates[0], 100)]
+        continue
+
+      if len(text) < 20:
+        code, conf = lldetect(text, candidates or self.langcodes)
+        if conf > 0:
+          results[i] = [Language(code, round(conf * 100))]
+          continue
+      pending.setdefault(candidates, []).append(i)
+
+    model = get_ngram_model(tuple(self.langcodes)) if pending else None
+    for candidates, indexes in pending.items():
+      codes, probs = model.probabilities([texts[i] for i in indexes], candidates)
+      for i, text_probs in zip(indexes, probs):
+        # Like langdetect, ignore languages with a low probability
+        top_3_choices = [j for j in np.argsort(-text_probs)[:3] if text_probs[j] > self.PROB_THRESHOLD]
+        if not len(top_3_choices):
+          results[i] = [Language("en", 0)]
+        else:
+          results[i] = [Language(codes[j], round(float(text_probs[j]) * 100)) for j in top_3_choices]
 
+    return results
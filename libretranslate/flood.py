@@ -1,23 +1,28 @@
-from libretranslate.storage import get_storage
+from libretranslate.storage import decay_score, get_storage
 
 active = False
 threshold = -1
 
-def forgive_banned():
-    global threshold
+# Every violation is forgiven after this many seconds
+FORGIVE_INTERVAL = 600
 
-    clear_list = []
-    s = get_storage()
-    banned = s.get_all_hash_int("banned")
+def score_key(request_ip):
+    return f"flood:{request_ip}"
 
-    for ip in banned:
-        if banned[ip] <= 0:
-            clear_list.append(ip)
-        else:
-            s.set_hash_int("banned", ip, min(threshold, banned[ip]) - 1)
+def fingerprint_key(request_ip):
+    return f"fingerprint:{request_ip}"
 
-    for ip in clear_list:
-        s.del_hash("banned", ip)
+def add_score(request_ip, amount):
+    # Scores decay over time and expire once they reach zero, nothing
+    # needs to sweep them. Capping them right above the threshold keeps
+    # banned clients banned for one interval after their last violation.
+    return get_storage().inc_decay(score_key(request_ip), amount, 1 / FORGIVE_INTERVAL, threshold + 1 if active else -1)
+
+def get_score(request_ip, value=None):
+    # value is the stored score, when the caller already read it
+    if value is None:
+        value = get_storage().get_str(score_key(request_ip))
+    return decay_score(value, 1 / FORGIVE_INTERVAL)
 
 def setup(args):
     global active
@@ -29,30 +34,27 @@ def setup(args):
 
 def report(request_ip):
     if active:
-        get_storage().inc_hash_int("banned", request_ip)
+        add_score(request_ip, 1)
 
 def decrease(request_ip):
-    s = get_storage()
-    if s.get_hash_int("banned", request_ip) > 0:
-        s.dec_hash_int("banned", request_ip)
+    if get_score(request_ip) > 0:
+        add_score(request_ip, -1)
 
 def has_violation(request_ip):
-    s = get_storage()
-    return s.get_hash_int("banned", request_ip) > 0
-
-def is_banned(request_ip):
-    s = get_storage()
+    return get_score(request_ip) > 0
 
+def is_banned(request_ip, value=None):
     # More than X offences?
-    return active and s.get_hash_int("banned", request_ip) >= threshold
+    return active and get_score(request_ip, value) >= threshold
 
-def fingerprint_mismatch(request_ip, fingerprint):
+def fingerprint_mismatch(request_ip, fingerprint, expected=None):
     if not isinstance(fingerprint, str) or fingerprint == "":
         return True
     
     s = get_storage()
-    k = f"fingerprint:{request_ip}"
-    expected = s.get_str(k)
+    k = fingerprint_key(request_ip)
+    if expected is None:
+        expected = s.get_str(k)
     if expected == "":
         s.set_str(k, fingerprint, ex=300)
         return False
@@ -1,5 +1,5 @@
 
-from argostranslate import package, translate
+from argostranslate import package
 from packaging import version
 from minisbd import download_models
 import libretranslate.language
@@ -74,7 +74,7 @@ def check_and_install_models(force=False, load_only_lang_codes=None,update=False
         download_models(load_only_lang_codes, print)
 
         # reload installed languages
-        libretranslate.language.languages = translate.get_installed_languages()
+        languages = libretranslate.language.reload_languages()
         print(
-            f"Loaded support for {len(translate.get_installed_languages())} languages ({len(available_packages)} models total)!"
+            f"Loaded support for {len(languages)} languages ({len(available_packages)} models total)!"
         )
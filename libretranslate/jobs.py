@@ -0,0 +1,194 @@
+import atexit
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import argostranslatefiles
+from apscheduler.schedulers.background import BackgroundScheduler
+from argostranslate.translate import Hypothesis, ITranslation
+
+from libretranslate.storage import get_storage
+
+manager = None
+def get_job_manager():
+    return manager
+
+# Texts translated at once by text jobs
+CHUNK_SIZE = 32
+
+# Jobs are kept in the memory of the process running them. Owners
+# refresh their jobs this often, jobs that have not been refreshed
+# for STALE_AFTER seconds (e.g. the worker was restarted) failed.
+HEARTBEAT_INTERVAL = 10
+STALE_AFTER = 60
+
+def get_owner():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class JobQueueFullError(Exception):
+    pass
+
+class Job:
+    def __init__(self, job_id, total=None, expire=1800):
+        self.id = job_id
+        self.status = "queued"
+        self.done = 0
+        self.total = total
+        self.result = None
+        self.error = None
+        self.expire = expire
+        self.owner = get_owner()
+        self.last_save = 0
+        self.lock = threading.Lock()
+
+    def advance(self, n=1):
+        self.done += n
+
+        # Don't hit the storage for every segment
+        if time.time() - self.last_save >= 1:
+            self.save()
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "progress": {"done": self.done, "total": self.total},
+            "result": self.result,
+            "error": self.error,
+        }
+
+    def save(self):
+        with self.lock:
+            self.last_save = time.time()
+            d = self.to_dict()
+            d["owner"] = self.owner
+            d["updated"] = self.last_save
+            get_storage().set_str(f"job:{self.id}", json.dumps(d), ex=self.expire)
+
+    @staticmethod
+    def load(job_id):
+        d = get_storage().get_str(f"job:{job_id}")
+        if not d:
+            return None
+
+        d = json.loads(d)
+        owner = d.pop("owner", None)
+        updated = d.pop("updated", 0)
+        if d["status"] in ["queued", "running"] and time.time() - updated > STALE_AFTER:
+            # The process running the job is gone
+            d["status"] = "error"
+            d["error"] = f"Job interrupted (worker {owner} stopped responding)"
+        return d
+
+class ProgressTranslation(ITranslation):
+    """Wraps a translation, counting translated segments towards a job's progress"""
+
+    def __init__(self, underlying, job):
+        self.underlying = underlying
+        self.from_lang = underlying.from_lang
+        self.to_lang = underlying.to_lang
+        self.job = job
+
+    def hypotheses(self, input_text, num_hypotheses=4):
+        hypotheses = self.underlying.hypotheses(input_text, num_hypotheses)
+        self.job.advance()
+        return hypotheses
+
+class CountingTranslation(ITranslation):
+    """Leaves texts untranslated, counting them"""
+
+    def __init__(self, underlying):
+        self.from_lang = underlying.from_lang
+        self.to_lang = underlying.to_lang
+        self.count = 0
+
+    def hypotheses(self, input_text, num_hypotheses=4):
+        self.count += 1
+        return [Hypothesis(input_text, 0) for i in range(num_hypotheses)]
+
+def count_file_segments(translation, filepath):
+    """Number of segments ProgressTranslation will count while translating
+    the file, found with a dry run that doesn't translate anything.
+    None if they cannot be counted."""
+    counter = CountingTranslation(translation)
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            argostranslatefiles.translate_file(counter, filepath, lambda t, path: os.path.join(tmp_dir, os.path.basename(path)))
+        return counter.count
+    except Exception as e:
+        print("Cannot count segments: " + str(e))
+        return None
+
+class JobManager:
+    def __init__(self, workers, max_pending):
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="libretranslate-job")
+        self.max_pending = max_pending
+        self.pending = 0
+        self.active = {} # job id --> queued or running job
+        self.lock = threading.Lock()
+
+        scheduler = BackgroundScheduler(daemon=True, timezone='UTC')
+        scheduler.add_job(self.heartbeat, "interval", seconds=HEARTBEAT_INTERVAL)
+        scheduler.start()
+
+        # Shut down the scheduler when exiting the app
+        atexit.register(lambda: scheduler.shutdown())
+
+    def is_full(self):
+        with self.lock:
+            return self.max_pending > 0 and self.pending >= self.max_pending
+
+    def submit(self, func, total=None):
+        """Queue func(job) for execution. The value it returns
+        is stored as the job's result"""
+        with self.lock:
+            if self.max_pending > 0 and self.pending >= self.max_pending:
+                raise JobQueueFullError()
+            self.pending += 1
+
+        job = Job(str(uuid.uuid4()), total)
+        job.save()
+        with self.lock:
+            self.active[job.id] = job
+        self.executor.submit(self.run, job, func)
+        return job
+
+    def heartbeat(self):
+        with self.lock:
+            active = list(self.active.values())
+
+        for job in active:
+            if time.time() - job.last_save >= HEARTBEAT_INTERVAL:
+                try:
+                    job.save()
+                except Exception as e:
+                    print("Cannot update job: " + str(e))
+
+    def run(self, job, func):
+        try:
+            job.status = "running"
+            job.save()
+            job.result = func(job)
+            job.status = "done"
+        except Exception as e:
+            job.status = "error"
+            job.error = str(e)
+        finally:
+            job.save()
+            with self.lock:
+                self.pending -= 1
+                del self.active[job.id]
+
+    def get(self, job_id):
+        return Job.load(job_id)
+
+def setup(workers, max_pending):
+    global manager
+
+    manager = JobManager(workers, max_pending)
+    return manager
@@ -3,15 +3,23 @@ from functools import lru_cache
 
 from argostranslate import translate
 
+from libretranslate.cache import get_detection_cache
 from libretranslate.detect import Detector
 
 __languages = None
+__registry = None
 aliases = {
     'pb': 'pt-BR',
     'zh': 'zh-Hans',
     'zt': 'zh-Hant',
 }
 rev_aliases = {v.lower(): k for k, v in aliases.items()}
+language_variants = {
+    'pt': ['pb'],
+    'pb': ['pt'],
+    'zh': ['zt'],
+    'zt': ['zh']
+}
 
 def iso2model(lang):
     if isinstance(lang, list):
@@ -42,30 +50,95 @@ def load_languages():
 
     return __languages
 
+def reload_languages():
+    global __languages
+
+    translate.get_installed_languages.cache_clear()
+    load_lang_codes.cache_clear()
+    __languages = None
+
+    return load_languages()
+
 @lru_cache(maxsize=None)
 def load_lang_codes():
     languages = load_languages()
     return tuple(l.code for l in languages)
 
-def get_language_with_fallback(lang_code, languages):
-    lang = next((l for l in languages if l.code == lang_code), None)
-    if lang is not None:
-        return lang
-    
-    language_variants = {
-        'pt': ['pb'],
-        'pb': ['pt'],
-        'zh': ['zt'],
-        'zt': ['zh']
-    }
-    
-    fallbacks = language_variants.get(lang_code, [])
-    for fallback_code in fallbacks:
-        fallback_lang = next((l for l in languages if l.code == fallback_code), None)
-        if fallback_lang is not None:
-            return fallback_lang
-    
-    return None
+class LanguageRegistry:
+    """Index of the loaded languages by code (and alias) and of
+    the translation to use for every (source, target) pair"""
+
+    def __init__(self, languages):
+        self.languages = languages
+        self.codes = {}
+        for lang in languages:
+            self.codes[lang.code] = lang
+            self.codes[lang.code.lower()] = lang
+
+        for code, alias in aliases.items():
+            if code in self.codes:
+                self.codes[alias.lower()] = self.codes[code]
+
+        self.translations = {}
+        for src in languages:
+            for tgt in languages:
+                translation = src.get_translation(tgt)
+                if translation is not None:
+                    self.translations[(src.code, tgt.code)] = translation
+
+    def get(self, lang_code):
+        return self.codes.get(lang_code)
+
+    def get_with_fallback(self, lang_code):
+        lang = self.get(lang_code)
+        if lang is not None:
+            return lang
+
+        for fallback_code in language_variants.get(lang_code, []):
+            lang = self.get(fallback_code)
+            if lang is not None:
+                return lang
+
+        return None
+
+    def get_translation(self, src_lang, tgt_lang):
+        return self.translations.get((src_lang.code, tgt_lang.code))
+
+def get_registry():
+    global __registry
+
+    # Rebuild whenever the set of loaded languages changes
+    languages = load_languages()
+    if __registry is None or __registry.languages is not languages:
+        __registry = LanguageRegistry(languages)
+
+    return __registry
+
+def detect_candidates(texts):
+    """Returns the candidate languages of every text"""
+    lang_codes = load_lang_codes()
+
+    try:
+        detector = Detector(lang_codes)
+        detection_cache = get_detection_cache()
+        if detection_cache is not None:
+            return detection_cache.detect_batch(detector, texts)
+        else:
+            return detector.detect_batch(texts)
+    except Exception as e:
+        print(str(e))
+        return [[] for t in texts]
+
+def detect_each_language(texts):
+    """Detects the language of every text separately"""
+    detected = []
+    for d in detect_candidates(texts):
+        if d:
+            detected.append({"confidence": d[0].confidence, "language": d[0].code})
+        else:
+            detected.append({"confidence": 0.0, "language": "en"})
+
+    return detected
 
 def detect_languages(text):
     # detect batch processing
@@ -79,14 +152,10 @@ def detect_languages(text):
 
     # get the candidates
     candidates = []
-    for t in text:
-        try:
-            d = Detector(lang_codes).detect(t)
-            for i in range(len(d)):
-                d[i].text_length = len(t)
-            candidates.extend(d)
-        except Exception as e:
-            print(str(e))
+    for t, d in zip(text, detect_candidates(text)):
+        for i in range(len(d)):
+            d[i].text_length = len(t)
+        candidates.extend(d)
 
     # total read bytes of the provided text
     text_length_total = sum(c.text_length for c in candidates)
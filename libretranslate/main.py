@@ -79,6 +79,54 @@ def get_parser():
         metavar="<number of texts>",
         help="Set maximum number of texts to translate in a batch request (%(default)s)",
     )
+    parser.add_argument(
+        "--batch-window",
+        default=DEFARGS['BATCH_WINDOW'],
+        type=int,
+        metavar="<milliseconds>",
+        help="Wait up to this many milliseconds to group concurrent translation requests for the same language pair into a single batch. 0 disables grouping (%(default)s)",
+    )
+    parser.add_argument(
+        "--batch-max-tokens",
+        default=DEFARGS['BATCH_MAX_TOKENS'],
+        type=int,
+        metavar="<number of words>",
+        help="Stop waiting for more requests once a grouped batch holds this many words (%(default)s)",
+    )
+    parser.add_argument(
+        "--decode-max-tokens",
+        default=DEFARGS['DECODE_MAX_TOKENS'],
+        type=int,
+        metavar="<number of tokens>",
+        help="Maximum number of tokens in each decode batch instead of ARGOS_BATCH_SIZE sentences (e.g. 4096). -1 to use ARGOS_BATCH_SIZE (%(default)s)",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        default=DEFARGS['MAX_CONCURRENCY'],
+        type=int,
+        metavar="<number of requests>",
+        help="Set maximum number of translation requests processed at the same time per process. -1 for no limit (%(default)s)",
+    )
+    parser.add_argument(
+        "--max-queue-depth",
+        default=DEFARGS['MAX_QUEUE_DEPTH'],
+        type=int,
+        metavar="<number of requests>",
+        help="When max-concurrency is reached, queue at most this many requests and reject the rest with 503 (%(default)s)",
+    )
+    parser.add_argument(
+        "--max-queue-wait",
+        default=DEFARGS['MAX_QUEUE_WAIT'],
+        type=int,
+        metavar="<seconds>",
+        help="Reject queued requests with 503 after waiting this many seconds (%(default)s)",
+    )
+    parser.add_argument(
+        "--adaptive-concurrency",
+        default=DEFARGS['ADAPTIVE_CONCURRENCY'],
+        action="store_true",
+        help="Lower the concurrency limit (up to max-concurrency) when latency rises",
+    )
     parser.add_argument(
         "--debug", default=DEFARGS['DEBUG'], action="store_true", help="Enable debug environment"
     )
@@ -179,7 +227,7 @@ def get_parser():
         type=str,
         default=DEFARGS['SHARED_STORAGE'],
         metavar="<Storage URI>",
-        help="Shared storage URI to use for multi-process data sharing (e.g. via gunicorn)",
+        help="Shared storage URI to use for multi-process data sharing (e.g. via gunicorn). memory:// accepts max_keys (1000000 by default), max_bytes (512MB by default, -1 disables a limit), shards and sweep_interval query parameters (e.g. memory://?max_keys=100000), redis:// accepts max_connections and socket_timeout for its connection pool. sqlite://path shares data between the processes of a single host",
     )
     parser.add_argument(
         "--secondary",
@@ -201,6 +249,20 @@ def get_parser():
         metavar="<maximum number of alternatives translations>",
         help="Set the maximum number of supported alternative translations (%(default)s)",
     )
+    parser.add_argument(
+        "--model-memory-budget",
+        default=DEFARGS['MODEL_MEMORY_BUDGET'],
+        type=int,
+        metavar="<megabytes>",
+        help="Unload the least recently used translation models when the loaded models exceed this size. -1 for no limit (%(default)s)",
+    )
+    parser.add_argument(
+        "--model-idle-ttl",
+        default=DEFARGS['MODEL_IDLE_TTL'],
+        type=int,
+        metavar="<seconds>",
+        help="Unload translation models that have not been used for this many seconds. -1 to keep them loaded (%(default)s)",
+    )
     parser.add_argument(
         "--threads",
         default=DEFARGS['THREADS'],
@@ -221,6 +283,20 @@ def get_parser():
         "--disable-files-translation", default=DEFARGS['DISABLE_FILES_TRANSLATION'], action="store_true",
         help="Disable files translation"
     )
+    parser.add_argument(
+        "--job-workers",
+        default=DEFARGS['JOB_WORKERS'],
+        type=int,
+        metavar="<number of threads>",
+        help="Set number of threads used to run queued translation jobs (%(default)s)",
+    )
+    parser.add_argument(
+        "--job-queue-limit",
+        default=DEFARGS['JOB_QUEUE_LIMIT'],
+        type=int,
+        metavar="<number of jobs>",
+        help="Set maximum number of queued or running translation jobs per process. -1 for no limit (%(default)s)",
+    )
     parser.add_argument(
         "--disable-web-ui", default=DEFARGS['DISABLE_WEB_UI'], action="store_true", help="Disable web ui"
     )
@@ -249,6 +325,40 @@ def get_parser():
         metavar="<comma separated API keys or 'all'>",
         help="Cache translation output for users with a particular API key (or 'all' to cache all translations)",
     )
+    parser.add_argument(
+        "--translation-cache-l1",
+        default=DEFARGS['TRANSLATION_CACHE_L1'],
+        type=int,
+        metavar="<number of translations>",
+        help="Keep up to this many cached translations in the memory of each worker, in front of the shared storage. 0 to always use the shared storage (%(default)s)",
+    )
+    parser.add_argument(
+        "--translation-cache-l1-ttl",
+        default=DEFARGS['TRANSLATION_CACHE_L1_TTL'],
+        type=int,
+        metavar="<seconds>",
+        help="Keep translations in the memory of each worker for at most this many seconds (%(default)s)",
+    )
+    parser.add_argument(
+        "--segment-cache",
+        default=DEFARGS['SEGMENT_CACHE'],
+        type=int,
+        metavar="<number of sentences>",
+        help="Keep up to this many translated sentences in memory and reuse them across requests. 0 disables the cache (%(default)s)",
+    )
+    parser.add_argument(
+        "--detection-cache",
+        default=DEFARGS['DETECTION_CACHE'],
+        type=int,
+        metavar="<number of texts>",
+        help="Keep up to this many language detection results in memory. 0 disables the cache (%(default)s)",
+    )
+    parser.add_argument(
+        "--detection-cache-storage",
+        default=DEFARGS['DETECTION_CACHE_STORAGE'],
+        action="store_true",
+        help="Also keep language detection results in the shared storage",
+    )
     parser.add_argument(
         "--url-prefix",
         default=DEFARGS['URL_PREFIX'],
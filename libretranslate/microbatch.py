@@ -0,0 +1,79 @@
+import threading
+
+from libretranslate.batching import batch_hypotheses
+
+batcher = None
+def get_batcher():
+    return batcher
+
+class PendingBatch:
+    def __init__(self):
+        self.texts = []
+        self.tokens = 0
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.results = None
+        self.error = None
+
+class MicroBatcher:
+    """Collects texts from concurrent requests for the same language pair
+    and translates them with a single batched decode call.
+
+    The first request to arrive waits up to `window` seconds (or until
+    `max_tokens` words are queued) for others to join, then translates
+    the whole batch and hands each request back its own slice."""
+
+    def __init__(self, window_ms, max_tokens):
+        self.window = max(0, window_ms) / 1000.0
+        self.max_tokens = max_tokens
+        self.enabled = self.window > 0
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def hypotheses(self, translation, texts, num_hypotheses):
+        if not self.enabled:
+            return batch_hypotheses(translation, texts, num_hypotheses)
+
+        key = (translation.from_lang.code, translation.to_lang.code, num_hypotheses)
+
+        with self.lock:
+            pending = self.pending.get(key)
+            leader = pending is None
+            if leader:
+                pending = self.pending[key] = PendingBatch()
+
+            start = len(pending.texts)
+            pending.texts.extend(texts)
+            pending.tokens += sum(len(t.split()) for t in texts)
+
+            if self.max_tokens > 0 and pending.tokens >= self.max_tokens:
+                # Batch is full, later requests start a new one
+                del self.pending[key]
+                pending.full.set()
+
+        if leader:
+            pending.full.wait(self.window)
+
+            with self.lock:
+                if self.pending.get(key) is pending:
+                    del self.pending[key]
+
+            try:
+                pending.results = batch_hypotheses(translation, pending.texts, num_hypotheses)
+            except Exception as e:
+                pending.error = e
+            finally:
+                pending.done.set()
+        else:
+            pending.done.wait()
+
+        if pending.error is not None:
+            raise pending.error
+
+        return pending.results[start:start + len(texts)]
+
+def setup(window_ms, max_tokens):
+    global batcher
+
+    batcher = MicroBatcher(window_ms, max_tokens)
+    return batcher
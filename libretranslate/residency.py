@@ -0,0 +1,144 @@
+import atexit
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+residency = None
+def get_residency():
+    return residency
+
+def lease(translation):
+    """Keep the models used by translation loaded for the duration
+    of a with block, see ModelResidency.lease"""
+    if residency is None or not residency.enabled:
+        return nullcontext()
+    return residency.lease(translation)
+
+def package_translations(translation):
+    """The translations backed by a model that translation is made of,
+    unwrapping cached, composite (pivot) and other wrapped translations"""
+    if hasattr(translation, "pkg"):
+        return [translation]
+
+    result = []
+    for attr in ["underlying", "t1", "t2"]:
+        t = getattr(translation, attr, None)
+        if t is not None:
+            result += package_translations(t)
+    return result
+
+def get_model_size(translation):
+    model_path = os.path.join(str(translation.pkg.package_path), "model")
+    try:
+        return sum(os.path.getsize(os.path.join(model_path, f)) for f in os.listdir(model_path))
+    except OSError:
+        return 0
+
+class ModelResidency:
+    """Keeps track of which translation models are loaded in memory,
+    unloading the least recently used ones when the memory budget
+    is exceeded or when they have been idle for too long"""
+
+    def __init__(self, memory_budget_mb=-1, idle_ttl=-1):
+        self.budget = memory_budget_mb * 1024 * 1024 if memory_budget_mb > 0 else -1
+        self.idle_ttl = idle_ttl
+        self.enabled = self.budget > 0 or self.idle_ttl > 0
+        self.resident = OrderedDict() # translation --> (size, last used)
+        self.leases = {} # translation --> number of translations in progress
+        self.evicted = 0
+        self.lock = threading.Lock()
+        self.resident_gauge = None
+        self.evicted_counter = None
+
+    @contextmanager
+    def lease(self, translation):
+        """Models are never unloaded while leased. Translations that
+        argostranslate loads on its own (HTML, files) are picked up
+        when the lease ends."""
+        translations = package_translations(translation)
+        with self.lock:
+            for t in translations:
+                self.leases[t] = self.leases.get(t, 0) + 1
+
+        try:
+            yield
+        finally:
+            with self.lock:
+                for t in translations:
+                    self.leases[t] -= 1
+                    if self.leases[t] == 0:
+                        del self.leases[t]
+
+            for t in translations:
+                self.touch(t)
+
+    def touch(self, translation):
+        """Mark the translation's model as used. Call this right after loading it."""
+        if not self.enabled:
+            return
+
+        with self.lock:
+            if translation.translator is None:
+                # Unloaded by another thread in the meantime
+                return
+
+            if translation in self.resident:
+                size = self.resident[translation][0]
+                self.resident.move_to_end(translation)
+            else:
+                size = get_model_size(translation)
+            self.resident[translation] = (size, time.time())
+
+            if self.budget > 0:
+                used = sum(s for s, _ in self.resident.values())
+                for t in list(self.resident):
+                    if used <= self.budget:
+                        break
+                    if t is translation or t in self.leases:
+                        continue
+                    used -= self.resident[t][0]
+                    self.unload(t)
+
+            self.update_metrics()
+
+    def sweep(self):
+        if self.idle_ttl <= 0:
+            return
+
+        with self.lock:
+            now = time.time()
+            for t in list(self.resident):
+                if now - self.resident[t][1] >= self.idle_ttl and t not in self.leases:
+                    self.unload(t)
+
+            self.update_metrics()
+
+    def unload(self, translation):
+        del self.resident[translation]
+        translation.translator = None
+        self.evicted += 1
+        if self.evicted_counter is not None:
+            self.evicted_counter.inc()
+
+    def update_metrics(self):
+        if self.resident_gauge is not None:
+            self.resident_gauge.set(len(self.resident))
+
+def setup(memory_budget_mb, idle_ttl):
+    global residency
+
+    residency = ModelResidency(memory_budget_mb, idle_ttl)
+
+    if idle_ttl > 0:
+        scheduler = BackgroundScheduler(daemon=True, timezone='UTC')
+        scheduler.add_job(residency.sweep, "interval", seconds=min(60, idle_ttl))
+        scheduler.start()
+
+        # Shut down the scheduler when exiting the app
+        atexit.register(lambda: scheduler.shutdown())
+
+    return residency
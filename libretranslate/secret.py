@@ -3,8 +3,17 @@ import random
 import string
 from functools import lru_cache
 
+from expiringdict import ExpiringDict
+
 from libretranslate.storage import get_storage
 
+SECRET_KEYS = ["secret_0", "secret_1", "secret_bogus"]
+
+# Secrets rotate every 30 minutes, keeping them around locally
+# for a few seconds saves a storage round trip on most requests
+SECRETS_CACHE_TTL = 5
+secrets_cache = ExpiringDict(max_len=1, max_age_seconds=SECRETS_CACHE_TTL)
+
 
 def to_base(n, b):
     if n == 0:
@@ -73,12 +82,27 @@ def generate_secret():
 def rotate_secrets():
     s = get_storage()
     secret_1 = s.get_str("secret_1")
-    s.set_str("secret_0", secret_1)
-    s.set_str("secret_1", generate_secret())
+    s.set_many({"secret_0": secret_1, "secret_1": generate_secret()})
+    secrets_cache.clear()
+
+def get_cached_secrets():
+    return secrets_cache.get("secrets")
+
+def cache_secrets(values):
+    """Cache the secrets read by the caller, values
+    maps each of SECRET_KEYS to its stored value"""
+    secrets_cache["secrets"] = {k: values[k] for k in SECRET_KEYS}
+
+def get_secrets():
+    secrets = get_cached_secrets()
+    if secrets is None:
+        secrets = dict(zip(SECRET_KEYS, get_storage().get_many(SECRET_KEYS)))
+        secrets_cache["secrets"] = secrets
+    return secrets
 
 def secret_match(secret):
-    s = get_storage()
-    return secret == s.get_str("secret_0") or secret == s.get_str("secret_1")
+    secrets = get_secrets()
+    return secret == secrets["secret_0"] or secret == secrets["secret_1"]
 
 def secret_bogus_match(secret):
     if random.randint(0, 1) == 0:
@@ -86,7 +110,7 @@ def secret_bogus_match(secret):
     return False
 
 def get_current_secret():
-    return get_storage().get_str("secret_1")
+    return get_secrets()["secret_1"]
 
 def get_current_secret_b64():
     return base64.b64encode(get_current_secret().encode("utf-8")).decode("utf-8")
@@ -95,7 +119,7 @@ def get_current_secret_js():
     return obfuscate(get_current_secret_b64())
 
 def get_bogus_secret():
-    return get_storage().get_str("secret_bogus")
+    return get_secrets()["secret_bogus"]
 
 def get_bogus_secret_b64():
     return base64.b64encode(get_bogus_secret().encode("utf-8")).decode("utf-8")
@@ -0,0 +1,90 @@
+import threading
+import time
+from concurrent.futures import Future
+from timeit import default_timer
+
+from libretranslate.storage import get_storage
+
+flights = None
+def get_flights():
+    return flights
+
+class SingleFlight:
+    """Coalesces identical work running at the same time, so that
+    a popular text is translated once instead of once per request"""
+
+    def __init__(self, lock_timeout=30, poll_interval=0.05):
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self.inflight = {}
+        self.lock = threading.Lock()
+
+    def do(self, key, func, lookup=None):
+        """Call func() once for all concurrent callers using the same key,
+        handing each of them its result.
+
+        When lookup is set, workers sharing the storage are coalesced as
+        well: one of them calls func() while the others wait for it to
+        finish and read its result with lookup() (typically from the cache),
+        falling back to func() if lookup() returns None."""
+        future, leader = self.claim(key)
+        if not leader:
+            return future.result()
+
+        try:
+            result = self.run(key, func, lookup)
+        except Exception as e:
+            self.done(key, future, error=e)
+            raise e
+
+        self.done(key, future, result)
+        return result
+
+    def claim(self, key):
+        """Returns the future of the work running for key and whether
+        the caller has to do it, in which case it must call done()"""
+        with self.lock:
+            future = self.inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self.inflight[key] = Future()
+        return future, leader
+
+    def done(self, key, future, result=None, error=None):
+        """Hand result (or error) to the callers waiting on key"""
+        with self.lock:
+            del self.inflight[key]
+
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def run(self, key, func, lookup):
+        if lookup is None:
+            return func()
+
+        storage = get_storage()
+        lock_key = "sflock_" + key
+        if storage.set_nx(lock_key, "1", ex=self.lock_timeout):
+            try:
+                return func()
+            finally:
+                storage.del_str(lock_key)
+
+        # Another worker is on it
+        deadline = default_timer() + self.lock_timeout
+        while storage.get_str(lock_key) != '' and default_timer() < deadline:
+            time.sleep(self.poll_interval)
+
+        result = lookup()
+        if result is not None:
+            return result
+
+        return func()
+
+def setup(lock_timeout=30):
+    global flights
+
+    flights = SingleFlight(lock_timeout)
+    return flights
@@ -1,5 +1,14 @@
-import redis
+import atexit
+import os
+import sqlite3
+import threading
 import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlparse
+
+import redis
+from apscheduler.schedulers.background import BackgroundScheduler
+from expiringdict import ExpiringDict
 
 storage = None
 def get_storage():
@@ -23,6 +32,10 @@ class Storage:
         raise Exception("not implemented")
     def get_str(self, key):
         raise Exception("not implemented")
+    def set_nx(self, key, value, ex=None):
+        raise Exception("not implemented")
+    def del_str(self, key):
+        raise Exception("not implemented")
 
     def set_hash_int(self, ns, key, value):
         raise Exception("not implemented")
@@ -38,83 +51,305 @@ class Storage:
     def del_hash(self, ns, key):
         raise Exception("not implemented")
 
+    def inc_decay(self, key, amount, rate, cap=-1):
+        raise Exception("not implemented")
+
+    def get_many(self, keys, raw=False):
+        raise Exception("not implemented")
+    def set_many(self, mapping, ex=None):
+        raise Exception("not implemented")
+
+def decay_score(value, rate, now=None):
+    """Current value of a score stored as "score|timestamp",
+    decreasing by rate every second"""
+    if not value:
+        return 0
+    if isinstance(value, bytes):
+        value = value.decode('utf-8')
+    if now is None:
+        now = time.time()
+
+    score, ts = value.split("|")
+    return max(0, float(score) - (now - float(ts)) * rate)
+
+def add_decay(value, amount, rate, cap=-1, now=None):
+    """Returns the new score and its "score|timestamp" value after
+    adding amount to a decaying score, or None if it reached 0"""
+    if now is None:
+        now = time.time()
+
+    score = decay_score(value, rate, now) + amount
+    if cap >= 0:
+        score = min(cap, score)
+    if score <= 0:
+        return 0, None
+    return score, f"{score}|{now}"
+
+# Never evicted from memory storage
+PINNED_KEYS = ("secret_",)
+
+class MemoryShard:
+    def __init__(self, max_keys, max_bytes):
+        self.max_keys = max_keys
+        self.max_bytes = max_bytes
+        self.data = OrderedDict() # key --> [value, expires at, size]
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+
+        if entry[1] is not None and entry[1] <= time.time():
+            self.delete(key)
+            return None
+
+        self.data.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, value, ex=None):
+        self.delete(key)
+        size = entry_size(key, value)
+        self.data[key] = [value, None if ex is None else time.time() + ex, size]
+        self.bytes += size
+        self.evict()
+
+    def resize(self, key, delta):
+        self.data[key][2] += delta
+        self.bytes += delta
+        self.evict()
+
+    def delete(self, key):
+        entry = self.data.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def over_limits(self, keys, size):
+        return (self.max_keys > 0 and keys > self.max_keys) or (self.max_bytes > 0 and size > self.max_bytes)
+
+    def evict(self):
+        if not self.over_limits(len(self.data), self.bytes):
+            return
+
+        # Least recently used first, never the entry in use
+        # nor pinned ones (losing the secrets would log everyone out)
+        in_use = next(reversed(self.data))
+        keys, size = len(self.data), self.bytes
+        evicted = []
+        for key, entry in self.data.items():
+            if not self.over_limits(keys, size):
+                break
+            if key == in_use or key.startswith(PINNED_KEYS):
+                continue
+            evicted.append(key)
+            keys -= 1
+            size -= entry[2]
+
+        for key in evicted:
+            self.delete(key)
+
+    def sweep(self):
+        now = time.time()
+        with self.lock:
+            for key in [k for k, e in self.data.items() if e[1] is not None and e[1] <= now]:
+                self.delete(key)
+
+def entry_size(key, value):
+    # Rough estimate of the memory used by an entry
+    if isinstance(value, (str, bytes)):
+        size = len(value)
+    elif isinstance(value, dict):
+        size = sum(len(k) + 64 for k in value)
+    else:
+        size = 8
+    return len(key) + size + 64
+
+DEFAULT_MAX_KEYS = 1000000
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+def shard_limit(limit, shards, i):
+    """Share of limit of the i-th of shards (-1 for no limit)"""
+    if limit <= 0:
+        return -1
+    return max(1, limit // shards + (1 if i < limit % shards else 0))
+
 class MemoryStorage(Storage):
-    def __init__(self):
-        self.store = {}
+    """In-process storage, bounded by max_keys and/or max_bytes
+    (least recently used entries are evicted first, -1 for no limit). Keys are spread
+    over shards, each with its own lock, and expired entries are
+    removed every sweep_interval seconds."""
+
+    def __init__(self, max_keys=DEFAULT_MAX_KEYS, max_bytes=DEFAULT_MAX_BYTES, shards=16, sweep_interval=60):
+        shards = max(1, shards)
+        self.shards = [MemoryShard(shard_limit(max_keys, shards, i), shard_limit(max_bytes, shards, i)) for i in range(shards)]
+
+        if sweep_interval > 0:
+            scheduler = BackgroundScheduler(daemon=True, timezone='UTC')
+            scheduler.add_job(self.sweep, "interval", seconds=sweep_interval)
+            scheduler.start()
+
+            # Shut down the scheduler when exiting the app
+            atexit.register(lambda: scheduler.shutdown())
+
+    def shard(self, key):
+        return self.shards[hash(key) % len(self.shards)]
+
+    def sweep(self):
+        for shard in self.shards:
+            shard.sweep()
 
     def exists(self, key):
-        return key in self.store
+        shard = self.shard(key)
+        with shard.lock:
+            return shard.get(key) is not None
 
     def set_bool(self, key, value):
-        self.store[key] = bool(value)
+        shard = self.shard(key)
+        with shard.lock:
+            shard.put(key, bool(value))
 
     def get_bool(self, key):
-        return bool(self.store[key])
+        shard = self.shard(key)
+        with shard.lock:
+            return bool(shard.get(key))
 
     def set_int(self, key, value):
-        self.store[key] = int(value)
+        shard = self.shard(key)
+        with shard.lock:
+            shard.put(key, int(value))
 
     def get_int(self, key):
-        return int(self.store.get(key, 0))
+        shard = self.shard(key)
+        with shard.lock:
+            return int(shard.get(key) or 0)
 
     def set_str(self, key, value, ex=None):
-        self.store[key] = {
-            'value': value,
-            'ex': None if ex is None else time.time() + ex
-        }
+        shard = self.shard(key)
+        with shard.lock:
+            shard.put(key, value, ex)
 
     def get_str(self, key, raw=False):
-        d = self.store.get(key, {'value': '', 'ex': None})
-        if d['ex'] is None:
-            return d['value']
-        else:
-            if d['ex'] <= time.time():
-                del self.store[key]
-                return ''
-            else:
-                return d['value']
+        shard = self.shard(key)
+        with shard.lock:
+            v = shard.get(key)
+            return '' if v is None else v
+
+    def set_nx(self, key, value, ex=None):
+        shard = self.shard(key)
+        with shard.lock:
+            if shard.get(key) is not None:
+                return False
+            shard.put(key, value, ex)
+            return True
+
+    def del_str(self, key):
+        shard = self.shard(key)
+        with shard.lock:
+            shard.delete(key)
+
+    def get_hash(self, shard, ns):
+        d = shard.get(ns)
+        if d is None:
+            d = {}
+            shard.put(ns, d)
+        return d
 
     def set_hash_int(self, ns, key, value):
-        if ns not in self.store:
-            self.store[ns] = {}
-        self.store[ns][key] = int(value)
+        shard = self.shard(ns)
+        with shard.lock:
+            d = self.get_hash(shard, ns)
+            if key not in d:
+                shard.resize(ns, len(key) + 64)
+            d[key] = int(value)
 
     def get_hash_int(self, ns, key):
-        d = self.store.get(ns, {})
-        return int(d.get(key, 0))
+        shard = self.shard(ns)
+        with shard.lock:
+            d = shard.get(ns) or {}
+            return int(d.get(key, 0))
 
     def inc_hash_int(self, ns, key):
-        if ns not in self.store:
-            self.store[ns] = {}
-
-        if key not in self.store[ns]:
-            self.store[ns][key] = 0
-        else:
-            self.store[ns][key] += 1
+        shard = self.shard(ns)
+        with shard.lock:
+            d = self.get_hash(shard, ns)
+            if key not in d:
+                d[key] = 0
+                shard.resize(ns, len(key) + 64)
+            else:
+                d[key] += 1
 
     def dec_hash_int(self, ns, key):
-        if ns not in self.store:
-            self.store[ns] = {}
-
-        if key not in self.store[ns]:
-            self.store[ns][key] = 0
-        else:
-            self.store[ns][key] -= 1
+        shard = self.shard(ns)
+        with shard.lock:
+            d = self.get_hash(shard, ns)
+            if key not in d:
+                d[key] = 0
+                shard.resize(ns, len(key) + 64)
+            else:
+                d[key] -= 1
 
     def get_all_hash_int(self, ns):
-        if ns in self.store:
-            return [{str(k): int(v)} for k,v in self.store[ns].items()]
-        else:
-            return []
+        shard = self.shard(ns)
+        with shard.lock:
+            d = shard.get(ns) or {}
+            return {str(k): int(v) for k,v in d.items()}
 
     def del_hash(self, ns, key):
-        del self.store[ns][key]
-
+        shard = self.shard(ns)
+        with shard.lock:
+            d = shard.get(ns)
+            if d is not None and key in d:
+                del d[key]
+                shard.resize(ns, -(len(key) + 64))
+
+    def inc_decay(self, key, amount, rate, cap=-1):
+        shard = self.shard(key)
+        with shard.lock:
+            score, value = add_decay(shard.get(key), amount, rate, cap)
+            if value is None:
+                shard.delete(key)
+            else:
+                shard.put(key, value, score / rate)
+            return score
+
+    def get_many(self, keys, raw=False):
+        return [self.get_str(key, raw) for key in keys]
+
+    def set_many(self, mapping, ex=None):
+        for key, value in mapping.items():
+            self.set_str(key, value, ex)
+
+
+# Same as add_decay, atomically
+INC_DECAY_SCRIPT = """
+local amount, rate, cap, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local score = 0
+local v = redis.call('GET', KEYS[1])
+if v then
+  local sep = string.find(v, '|', 1, true)
+  score = math.max(0, tonumber(string.sub(v, 1, sep - 1)) - (now - tonumber(string.sub(v, sep + 1))) * rate)
+end
+score = score + amount
+if cap >= 0 and score > cap then
+  score = cap
+end
+if score <= 0 then
+  redis.call('DEL', KEYS[1])
+  return '0'
+end
+redis.call('SET', KEYS[1], string.format('%.17g|%.17g', score, now), 'PX', math.ceil(score / rate * 1000))
+return string.format('%.17g', score)
+"""
 
 class RedisStorage(Storage):
     def __init__(self, redis_uri):
-        self.conn = redis.from_url(redis_uri)
+        # Threads wait for a free connection rather than failing
+        # once max_connections (redis://...?max_connections=N) are in use
+        self.pool = redis.BlockingConnectionPool.from_url(redis_uri)
+        self.conn = redis.Redis(connection_pool=self.pool)
         self.conn.ping()
+        self.inc_decay_script = self.conn.register_script(INC_DECAY_SCRIPT)
 
     def exists(self, key):
         return bool(self.conn.exists(key))
@@ -148,6 +383,12 @@ class RedisStorage(Storage):
             else:
                 return v.decode('utf-8')
 
+    def set_nx(self, key, value, ex=None):
+        return bool(self.conn.set(key, value, ex=ex, nx=True))
+
+    def del_str(self, key):
+        self.conn.delete(key)
+
     def get_hash_int(self, ns, key):
         v = self.conn.hget(ns, key)
         if v is None:
@@ -170,12 +411,210 @@ class RedisStorage(Storage):
     def del_hash(self, ns, key):
         self.conn.hdel(ns, key)
 
+    def inc_decay(self, key, amount, rate, cap=-1):
+        return float(self.inc_decay_script(keys=[key], args=[amount, rate, cap, time.time()]))
+
+    def get_many(self, keys, raw=False):
+        if not keys:
+            return []
+        return [self.decode_str(v, raw) for v in self.conn.mget(keys)]
+
+    def set_many(self, mapping, ex=None):
+        if not mapping:
+            return
+        pipe = self.conn.pipeline(transaction=False)
+        if ex is None:
+            pipe.mset(mapping)
+        else:
+            for key, value in mapping.items():
+                pipe.set(key, value, ex=ex)
+        pipe.execute()
+
+    def decode_str(self, v, raw=False):
+        if v is None:
+            return ""
+        return v if raw else v.decode('utf-8')
+
+# Keys of values that never change once written
+CACHEABLE_KEYS = ("tcache_", "dcache_")
+
+class SQLiteStorage(Storage):
+    """Storage shared by the processes of a single host through a SQLite
+    database in WAL mode. Expired keys are removed every cleanup_interval
+    seconds. Cached translations and detections, which never change once
+    written, are also kept in each process for cache_ttl seconds (0 to
+    always read from the database)."""
+
+    def __init__(self, db_path, cache_ttl=1, cache_size=10000, cleanup_interval=60, timeout=5):
+        self.db_path = db_path
+        self.timeout = timeout
+        self.local = threading.local()
+        self.cache = ExpiringDict(max_len=cache_size, max_age_seconds=cache_ttl) if cache_ttl > 0 and cache_size > 0 else None
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir != '' and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+
+        conn = self.conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB, ex REAL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS hash (ns TEXT, key TEXT, value INTEGER, PRIMARY KEY (ns, key))")
+
+        if cleanup_interval > 0:
+            scheduler = BackgroundScheduler(daemon=True, timezone='UTC')
+            scheduler.add_job(self.cleanup, "interval", seconds=cleanup_interval)
+            scheduler.start()
+
+            # Shut down the scheduler when exiting the app
+            atexit.register(lambda: scheduler.shutdown())
+
+    def conn(self):
+        # One connection per thread, statements are prepared once per connection
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None,
+                                   check_same_thread=False, cached_statements=64)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def transaction(self):
+        return SQLiteTransaction(self.conn())
+
+    def cleanup(self):
+        self.conn().execute("DELETE FROM kv WHERE ex IS NOT NULL AND ex <= ?", (time.time(), ))
+
+    def get(self, key):
+        row = self.conn().execute("SELECT value FROM kv WHERE key = ? AND (ex IS NULL OR ex > ?)", (key, time.time())).fetchone()
+        return None if row is None else row[0]
+
+    def put(self, key, value, ex=None):
+        self.conn().execute("INSERT OR REPLACE INTO kv (key, value, ex) VALUES (?, ?, ?)",
+                            (key, value, None if ex is None else time.time() + ex))
+
+    def exists(self, key):
+        return self.get(key) is not None
+
+    def set_bool(self, key, value):
+        self.put(key, 1 if value else 0)
+
+    def get_bool(self, key):
+        return bool(self.get(key))
+
+    def set_int(self, key, value):
+        self.put(key, int(value))
+
+    def get_int(self, key):
+        return int(self.get(key) or 0)
+
+    def cacheable(self, key):
+        # Everything else (locks, secrets, scores, jobs) can be
+        # changed by other processes at any time
+        return self.cache is not None and key.startswith(CACHEABLE_KEYS)
+
+    def set_str(self, key, value, ex=None):
+        self.put(key, value, ex)
+        if self.cacheable(key):
+            self.cache[key] = value
+
+    def get_str(self, key, raw=False):
+        v = self.cache.get(key) if self.cacheable(key) else None
+        if v is None:
+            v = self.get(key)
+            if v is None:
+                return ""
+            if self.cacheable(key):
+                self.cache[key] = v
+
+        if isinstance(v, bytes) and not raw:
+            return v.decode('utf-8')
+        return v
+
+    def set_nx(self, key, value, ex=None):
+        now = time.time()
+        cur = self.conn().execute(
+            "INSERT INTO kv (key, value, ex) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, ex = excluded.ex "
+            "WHERE kv.ex IS NOT NULL AND kv.ex <= ?",
+            (key, value, None if ex is None else now + ex, now))
+        return cur.rowcount > 0
+
+    def del_str(self, key):
+        self.conn().execute("DELETE FROM kv WHERE key = ?", (key, ))
+        if self.cache is not None:
+            self.cache.pop(key, None)
+
+    def set_hash_int(self, ns, key, value):
+        self.conn().execute("INSERT OR REPLACE INTO hash (ns, key, value) VALUES (?, ?, ?)", (ns, key, int(value)))
+
+    def get_hash_int(self, ns, key):
+        row = self.conn().execute("SELECT value FROM hash WHERE ns = ? AND key = ?", (ns, key)).fetchone()
+        return 0 if row is None else int(row[0])
+
+    def add_hash_int(self, ns, key, delta):
+        with self.transaction():
+            self.conn().execute("INSERT INTO hash (ns, key, value) VALUES (?, ?, ?) "
+                                "ON CONFLICT (ns, key) DO UPDATE SET value = value + excluded.value", (ns, key, delta))
+            return self.get_hash_int(ns, key)
+
+    def inc_hash_int(self, ns, key):
+        return self.add_hash_int(ns, key, 1)
+
+    def dec_hash_int(self, ns, key):
+        return self.add_hash_int(ns, key, -1)
+
+    def get_all_hash_int(self, ns):
+        rows = self.conn().execute("SELECT key, value FROM hash WHERE ns = ?", (ns, )).fetchall()
+        return {str(k): int(v) for k, v in rows}
+
+    def del_hash(self, ns, key):
+        self.conn().execute("DELETE FROM hash WHERE ns = ? AND key = ?", (ns, key))
+
+    def inc_decay(self, key, amount, rate, cap=-1):
+        with self.transaction():
+            score, value = add_decay(self.get(key), amount, rate, cap)
+            if value is None:
+                self.del_str(key)
+            else:
+                self.set_str(key, value, score / rate)
+            return score
+
+    def get_many(self, keys, raw=False):
+        return [self.get_str(key, raw) for key in keys]
+
+    def set_many(self, mapping, ex=None):
+        with self.transaction():
+            for key, value in mapping.items():
+                self.set_str(key, value, ex)
+
+class SQLiteTransaction:
+    def __init__(self, conn):
+        self.conn = conn
+        self.nested = False
+
+    def __enter__(self):
+        self.nested = self.conn.in_transaction
+        if not self.nested:
+            self.conn.execute("BEGIN IMMEDIATE")
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self.nested:
+            self.conn.execute("COMMIT" if exc_type is None else "ROLLBACK")
+
 def setup(storage_uri):
     global storage
     if storage_uri.startswith("memory://"):
-        storage = MemoryStorage()
+        # e.g. memory://?max_keys=100000&max_bytes=104857600&sweep_interval=60
+        params = {k: int(v[0]) for k, v in parse_qs(urlparse(storage_uri).query).items()}
+        storage = MemoryStorage(**params)
     elif storage_uri.startswith("redis://"):
         storage = RedisStorage(storage_uri)
+    elif storage_uri.startswith("sqlite://"):
+        # e.g. sqlite:///var/lib/libretranslate/storage.db?cache_ttl=1&cleanup_interval=60
+        uri = urlparse(storage_uri)
+        params = {k: int(v[0]) for k, v in parse_qs(uri.query).items()}
+        storage = SQLiteStorage(uri.netloc + uri.path, **params)
     else:
         raise Exception("Invalid storage URI: " + storage_uri)
 
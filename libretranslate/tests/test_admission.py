@@ -0,0 +1,113 @@
+import threading
+import time
+
+import pytest
+
+from libretranslate.admission import AdmissionQueue, OverloadedError
+
+
+def test_admission_disabled():
+    q = AdmissionQueue(max_concurrency=-1)
+    for i in range(100):
+        q.acquire()
+
+    assert q.active == 0
+
+
+def test_admission_queue_full():
+    q = AdmissionQueue(max_concurrency=1, max_queue=0, max_wait=10)
+    q.acquire()
+
+    with pytest.raises(OverloadedError) as e:
+        q.acquire()
+    assert e.value.retry_after == 10
+
+    q.release()
+    q.acquire()
+    assert q.active == 1
+
+
+def test_admission_queue_wait():
+    q = AdmissionQueue(max_concurrency=1, max_queue=1, max_wait=10)
+    q.acquire()
+
+    admitted = threading.Event()
+    def wait():
+        q.acquire()
+        admitted.set()
+
+    t = threading.Thread(target=wait)
+    t.start()
+    time.sleep(0.05)
+    assert q.waiting == 1
+    assert not admitted.is_set()
+
+    # Only one request can wait
+    with pytest.raises(OverloadedError):
+        q.acquire()
+
+    q.release()
+    assert admitted.wait(1)
+    t.join()
+    assert q.active == 1
+    assert q.waiting == 0
+
+
+def test_admission_queue_timeout():
+    q = AdmissionQueue(max_concurrency=1, max_queue=1, max_wait=0.05)
+    q.acquire()
+
+    start = time.time()
+    with pytest.raises(OverloadedError):
+        q.acquire()
+
+    assert time.time() - start >= 0.05
+    assert q.waiting == 0
+    assert q.active == 1
+
+
+def test_admission_retry_after():
+    q = AdmissionQueue(max_concurrency=2, max_queue=4, max_wait=2.5)
+
+    # Without latency measurements, retry once the queue wait is over
+    assert q.get_retry_after() == 3
+
+    q.latency = 4
+    q.waiting = 3
+    assert q.get_retry_after() == 8
+
+    q.latency = 0.001
+    assert q.get_retry_after() == 1
+
+
+def test_admission_adaptive_limit():
+    q = AdmissionQueue(max_concurrency=8, adaptive=True)
+
+    # Latency well above the best observed lowers the limit
+    q.update_limit(0.1)
+    for i in range(20):
+        q.update_limit(1)
+    assert q.limit < 8
+    assert q.limit >= 1
+
+    # And it slowly goes back up to max_concurrency
+    lowered = q.limit
+    for i in range(2000):
+        q.update_limit(0.1)
+    assert q.limit > lowered
+    assert q.limit <= 8
+
+
+def test_admission_adaptive_release():
+    q = AdmissionQueue(max_concurrency=4, adaptive=True)
+    q.acquire()
+    q.release(0.1)
+    assert q.latency == 0.1
+
+    # Non adaptive queues don't track latency
+    q = AdmissionQueue(max_concurrency=4)
+    q.acquire()
+    q.release(0.1)
+    assert q.latency is None
+    assert q.limit == 4
+
@@ -14,6 +14,15 @@ def app():
     yield app
 
 
+@pytest.fixture()
+def app_with_args():
+    def create(*args):
+        sys.argv = ['', '--load-only', 'en,es', *args]
+        return create_app(get_args())
+
+    return create
+
+
 @pytest.fixture()
 def client(app):
     return app.test_client()
@@ -0,0 +1,30 @@
+import json
+import time
+
+
+def test_api_jobs(client):
+    response = client.post("/jobs", json={
+        "q": ["Hello", "World"],
+        "source": "en",
+        "target": "es"
+    })
+    response_json = json.loads(response.data)
+
+    assert response.status_code == 202
+    assert "id" in response_json
+
+    for _ in range(100):
+        job = json.loads(client.get("/jobs/" + response_json["id"]).data)
+        if job["status"] in ["done", "error"]:
+            break
+        time.sleep(0.1)
+
+    assert job["status"] == "done"
+    assert job["progress"] == {"done": 2, "total": 2}
+    assert len(job["result"]["translatedText"]) == 2
+
+
+def test_api_jobs_not_found(client):
+    response = client.get("/jobs/not-a-job")
+
+    assert response.status_code == 404
@@ -1,4 +1,12 @@
 import json
+import threading
+import time
+
+import pytest
+from argostranslate.translate import CompositeTranslation, get_translation_from_codes
+
+from libretranslate import admission, batching, microbatch, singleflight
+from libretranslate.cache import get_segment_cache, get_translation_cache
 
 
 def test_api_translate(client):
@@ -32,6 +40,161 @@ def test_api_translate_batch(client):
     assert response.status_code == 200
 
 
+def translate(client, q, **kwargs):
+    response = client.post("/translate", json={
+        "q": q,
+        "source": "en",
+        "target": "es",
+        "format": "text",
+        **kwargs
+    })
+
+    assert response.status_code == 200
+    return json.loads(response.data)
+
+
+def assert_same_hypotheses(translation, texts):
+    for num_hypotheses in [1, 3]:
+        batched = batching.batch_hypotheses(translation, texts, num_hypotheses)
+
+        assert len(batched) == len(texts)
+        for text, hypotheses in zip(texts, batched):
+            expected = translation.hypotheses(text, num_hypotheses)
+            assert [h.value for h in hypotheses] == [h.value for h in expected]
+            assert [h.score for h in hypotheses] == pytest.approx([h.score for h in expected], abs=1e-3)
+
+
+def test_api_translate_batch_matches_single(app):
+    assert_same_hypotheses(get_translation_from_codes("en", "es"), [
+        "Hello",
+        "How are you? I am fine, thank you.",
+        "This is the first paragraph.\n\nThis is the second one. It has two sentences.",
+        "Hello",
+    ])
+
+
+def test_api_translate_batch_pivot_matches_single(app):
+    pivot = CompositeTranslation(get_translation_from_codes("en", "es"), get_translation_from_codes("es", "en"))
+
+    assert_same_hypotheses(pivot, [
+        "Good morning",
+        "The weather is nice today.\nLet's go for a walk.",
+    ])
+
+
+def test_api_translate_batch_alternatives(client):
+    texts = ["Hello", "How are you?", "Good morning.\nSee you tomorrow."]
+    response_json = translate(client, texts, alternatives=2)
+
+    for i, text in enumerate(texts):
+        single = translate(client, text, alternatives=2)
+        assert response_json["translatedText"][i] == single["translatedText"]
+        assert response_json["alternatives"][i] == single["alternatives"]
+
+
+def test_api_translate_micro_batches(app_with_args, monkeypatch):
+    calls = []
+    batch_hypotheses = microbatch.batch_hypotheses
+    def counting_batch_hypotheses(translation, texts, num_hypotheses):
+        calls.append(len(texts))
+        return batch_hypotheses(translation, texts, num_hypotheses)
+    monkeypatch.setattr(microbatch, "batch_hypotheses", counting_batch_hypotheses)
+
+    app = app_with_args("--batch-window", "300")
+    texts = ["Hello", "Good morning", "How are you?", "Thank you very much", "See you tomorrow"]
+    expected = [translate(app.test_client(), text) for text in texts]
+
+    calls.clear()
+    results = [None] * len(texts)
+    def run(i):
+        results[i] = translate(app.test_client(), texts[i])
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(texts))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # Every request gets its own translation back
+    assert results == expected
+    assert len(calls) < len(texts)
+
+
+def test_api_translate_segment_cache(app_with_args):
+    client = app_with_args().test_client()
+    first = ["Hello.", "Good morning.", "How are you?"]
+    second = ["How are you? Hello.", "See you tomorrow.", "Good morning."]
+    expected = [translate(client, q, alternatives=2) for q in [first, second]]
+
+    client = app_with_args("--segment-cache", "1000").test_client()
+    results = [translate(client, q, alternatives=2) for q in [first, second]]
+
+    assert len(get_segment_cache().store) > 0
+    # Sentences cached by the first request are reused in the right place
+    assert results == expected
+
+
+def test_api_translate_overloaded(app_with_args):
+    client = app_with_args("--max-concurrency", "1", "--max-queue-depth", "0").test_client()
+
+    # Another request is translating
+    admission.get_admission().acquire()
+    response = client.post("/translate", json={
+        "q": "Hello",
+        "source": "en",
+        "target": "es",
+    })
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "10"
+    assert "error" in json.loads(response.data)
+
+    admission.get_admission().release()
+    assert client.post("/translate", json={
+        "q": "Hello",
+        "source": "en",
+        "target": "es",
+    }).status_code == 200
+
+
+def test_api_translate_batch_mixed_languages(client):
+
+    response = client.post("/translate", json={
+        "q": ["Hello, how are you doing today? I hope all is well.", "Hola, ¿cómo estás hoy? Espero que todo vaya bien."],
+        "source": "auto",
+        "target": "es",
+        "format": "text"
+    })
+
+    response_json = json.loads(response.data)
+
+    assert response.status_code == 200
+    assert [d["language"] for d in response_json["detectedLanguage"]] == ["en", "es"]
+    # Already in the target language
+    assert response_json["translatedText"][1] == "Hola, ¿cómo estás hoy? Espero que todo vaya bien."
+
+
+def test_api_translate_batch_mostly_target_language(client):
+
+    response = client.post("/translate", json={
+        "q": [
+            "Hola, ¿cómo estás hoy? Espero que todo vaya bien.",
+            "Muchas gracias por tu ayuda con el proyecto de la semana pasada.",
+            "Hello, how are you doing today?"
+        ],
+        "source": "auto",
+        "target": "es",
+        "format": "text"
+    })
+
+    response_json = json.loads(response.data)
+
+    assert response.status_code == 200
+    assert [d["language"] for d in response_json["detectedLanguage"]] == ["es", "es", "en"]
+    assert response_json["translatedText"][0] == "Hola, ¿cómo estás hoy? Espero que todo vaya bien."
+    assert response_json["translatedText"][1] == "Muchas gracias por tu ayuda con el proyecto de la semana pasada."
+    assert response_json["translatedText"][2] != "Hello, how are you doing today?"
+
+
 def test_api_translate_unsupported_language(client):
     response = client.post("/translate", data={
         "q": "Hello",
@@ -59,3 +222,58 @@ def test_api_translate_missing_parameter(client):
     assert "error" in response_json
     assert response_json["error"] == "Invalid request: missing q parameter"
     assert response.status_code == 400
+
+
+def test_api_translate_stream(client):
+    response = client.post("/translate_stream", json={
+        "q": ["Hello", "World"],
+        "source": "en",
+        "target": "es",
+        "format": "text"
+    })
+
+    lines = [json.loads(l) for l in response.data.decode("utf-8").splitlines() if l]
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    assert [l["index"] for l in lines[:-1]] == [0, 1]
+    assert lines[-1]["translatedText"] == [l["translatedText"] for l in lines[:-1]]
+
+
+def test_api_translate_stream_admission(app_with_args):
+    client = app_with_args("--max-concurrency", "1", "--max-queue-depth", "0").test_client()
+
+    # Invalid requests give their slot back
+    assert client.post("/translate_stream", json={"source": "en", "target": "es"}).status_code == 400
+    assert admission.get_admission().active == 0
+
+    # Requests are admitted before doing any work
+    admission.get_admission().acquire()
+    response = client.post("/translate_stream", json={"source": "en", "target": "es"})
+    admission.get_admission().release()
+
+    assert response.status_code == 503
+
+
+def test_api_translate_stream_single_flight(client):
+    request = {"q": ["Hello", "World"], "source": "en", "target": "es", "format": "text"}
+
+    # An identical translation is already running
+    flights = singleflight.get_flights()
+    key = get_translation_cache().key(request["q"], "en", "es", "text", 0)
+    future, leader = flights.claim(key)
+    assert leader
+
+    lines = []
+    def run():
+        response = client.post("/translate_stream", json=request)
+        lines.extend(json.loads(l) for l in response.data.decode("utf-8").splitlines() if l)
+    t = threading.Thread(target=run)
+    t.start()
+    time.sleep(0.5)
+    expected = {"translatedText": ["Hola", "Mundo"]}
+    flights.done(key, future, expected)
+    t.join()
+
+    assert [l["translatedText"] for l in lines[:-1]] == expected["translatedText"]
+    assert lines[-1] == expected
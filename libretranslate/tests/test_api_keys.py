@@ -0,0 +1,59 @@
+import time
+
+from libretranslate.api_keys import Database
+
+
+def wait_for(cond, timeout=5):
+    deadline = time.time() + timeout
+    while not cond() and time.time() < deadline:
+        time.sleep(0.05)
+    return cond()
+
+
+def test_database_lookup(tmp_path):
+    db = Database(str(tmp_path / "api_keys.db"))
+    api_key, req_limit, char_limit = db.add(10, char_limit=500)
+
+    assert db.lookup(api_key) == (10, 500)
+    assert db.lookup("missing") is None
+
+    db.remove(api_key)
+    assert db.lookup(api_key) is None
+
+
+def test_database_reload(tmp_path):
+    db_path = str(tmp_path / "api_keys.db")
+    db = Database(db_path, reload_interval=1)
+
+    # Another process (e.g. ltmanage) changes the keys
+    other = Database(db_path)
+    other.add(10, api_key="key1")
+    other.add(20, api_key="key2")
+    assert db.lookup("key1") is None
+
+    assert wait_for(lambda: db.lookup("key1") == (10, None))
+    assert db.lookup("key2") == (20, None)
+
+    other.remove("key1")
+    assert wait_for(lambda: db.lookup("key1") is None)
+    assert db.lookup("key2") == (20, None)
+
+
+def test_database_check_changes(tmp_path):
+    db_path = str(tmp_path / "api_keys.db")
+    db = Database(db_path, reload_interval=3600)
+    reloads = []
+    reload = db.reload
+    def counting_reload(conn):
+        reloads.append(1)
+        reload(conn)
+    db.reload = counting_reload
+
+    # Nothing changed, nothing to reload
+    db.check_changes()
+    assert reloads == []
+
+    Database(db_path).add(10, api_key="key1")
+    db.check_changes()
+    assert reloads == [1]
+    assert db.lookup("key1") == (10, None)
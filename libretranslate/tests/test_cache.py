@@ -0,0 +1,71 @@
+import time
+
+import pytest
+
+from libretranslate import storage
+from libretranslate.cache import LRUCache, TranslationCache
+from libretranslate.storage import MemoryStorage
+
+
+@pytest.fixture(autouse=True)
+def shared_storage(monkeypatch):
+    s = MemoryStorage(sweep_interval=0)
+    monkeypatch.setattr(storage, "storage", s)
+    return s
+
+
+def test_lru_cache():
+    c = LRUCache(2, 60)
+    c["a"] = 1
+    c["b"] = 2
+    c.get("a")
+    c["c"] = 3
+
+    # Least recently used goes first, not the oldest
+    assert c.get("a") == 1
+    assert c.get("b") is None
+    assert c.get("c") == 3
+    assert len(c) == 2
+
+
+def test_lru_cache_expiry():
+    c = LRUCache(2, 0.05)
+    c["a"] = 1
+    assert c.get("a") == 1
+
+    time.sleep(0.1)
+    assert c.get("a") is None
+    assert len(c) == 0
+
+
+def test_translation_cache_counters(shared_storage):
+    c = TranslationCache(["all"], l1_max_len=10)
+    key = c.key("Hello", "en", "es", "text", 0)
+
+    assert c.get(key) is None
+    c.cache(key, {"translatedText": "Hola"})
+    assert c.get(key) == '{"translatedText": "Hola"}'
+
+    # Another worker only finds it in the storage
+    other = TranslationCache(["all"], l1_max_len=10)
+    assert other.get(key) == '{"translatedText": "Hola"}'
+    assert other.get(key) == '{"translatedText": "Hola"}'
+
+    assert (c.l1_hits, c.l2_hits, c.misses) == (1, 0, 1)
+    assert (other.l1_hits, other.l2_hits, other.misses) == (1, 1, 0)
+
+
+def test_translation_cache_without_l1(shared_storage):
+    c = TranslationCache(["all"])
+    key = c.key("Hello", "en", "es", "text", 0)
+    c.cache(key, {"translatedText": "Hola"})
+
+    assert c.get(key) == '{"translatedText": "Hola"}'
+    assert (c.l1_hits, c.l2_hits, c.misses) == (0, 1, 0)
+
+
+def test_translation_cache_key():
+    c = TranslationCache(["all"])
+
+    assert c.key("a|b", "en", "es", "text", 0) != c.key(["a", "b"], "en", "es", "text", 0)
+    assert c.key("a", "en", "es", "text", 0) != c.key("a", "en", "es", "html", 0)
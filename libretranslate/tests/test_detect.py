@@ -0,0 +1,85 @@
+import pytest
+
+from libretranslate.detect import Detector, get_script_table, text_script
+
+LANGCODES = ("en", "es", "fr", "de", "it", "pt", "ru", "uk", "el", "ko", "ja", "zh", "zt")
+
+
+@pytest.mark.parametrize("text,code", [
+    ("Hello, how are you doing today? I hope all is well.", "en"),
+    ("Hola, ¿cómo estás hoy? Espero que todo vaya bien.", "es"),
+    ("Bonjour, comment allez-vous aujourd'hui ? J'espère que tout va bien.", "fr"),
+    ("Guten Tag, wie geht es Ihnen heute? Ich hoffe, alles ist gut.", "de"),
+    ("Привет, как дела сегодня? Надеюсь, всё хорошо.", "ru"),
+])
+def test_detect(text, code):
+    languages = Detector(LANGCODES).detect(text)
+
+    assert languages[0].code == code
+    # Like langdetect, clear sentences are detected with (nearly) full confidence
+    assert languages[0].confidence >= 99
+
+
+def test_detect_ambiguous():
+    languages = Detector(LANGCODES).detect("Hotel Restaurant Taxi Bar")
+
+    assert len(languages) > 1
+    assert sum(lang.confidence for lang in languages) <= 100
+    assert all(lang.confidence > 10 for lang in languages)
+
+
+@pytest.mark.parametrize("text,codes", [
+    ("The meeting is tomorrow. La reunión es mañana.", ["es", "en"]),
+    ("Obrigado pela sua ajuda hoje", ["pt", "es"]),
+])
+def test_detect_uncertain(text, codes):
+    languages = Detector(LANGCODES).detect(text)
+
+    # Mixed or closely related languages aren't detected with full confidence
+    assert [lang.code for lang in languages[:2]] == codes
+    assert languages[0].confidence < 100
+
+
+@pytest.mark.parametrize("text,code", [
+    ("안녕하세요, 오늘 어떻게 지내세요?", "ko"),
+    ("Καλημέρα, πώς είστε σήμερα;", "el"),
+    ("今日はとても良い天気ですね。散歩に行きましょう。", "ja"),
+])
+def test_detect_single_language_script(text, code):
+    languages = Detector(LANGCODES).detect(text)
+
+    assert [(lang.code, lang.confidence) for lang in languages] == [(code, 100)]
+
+
+def test_detect_han():
+    assert text_script("我今天很高兴见到你") == "Han"
+    assert get_script_table(LANGCODES)["Han"] == ("ja", "zh", "zt")
+
+    # Several loaded languages use Han characters
+    languages = Detector(LANGCODES).detect("我今天很高兴见到你，我们一起去吃饭吧。")
+    assert languages[0].code == "zh"
+    assert all(lang.code in ["ja", "zh", "zt"] for lang in languages)
+
+    # Only one does
+    languages = Detector(("en", "zh")).detect("我今天很高兴见到你，我们一起去吃饭吧。")
+    assert [(lang.code, lang.confidence) for lang in languages] == [("zh", 100)]
+
+
+@pytest.mark.parametrize("text", ["", "   ", "12345 678", "?!"])
+def test_detect_no_features(text):
+    languages = Detector(LANGCODES).detect(text)
+
+    assert [(lang.code, lang.confidence) for lang in languages] == [("en", 0)]
+
+
+def test_detect_batch():
+    texts = [
+        "Hello, how are you doing today? I hope all is well.",
+        "",
+        "안녕하세요, 오늘 어떻게 지내세요?",
+        "Hola, ¿cómo estás hoy? Espero que todo vaya bien.",
+    ]
+    detector = Detector(LANGCODES)
+
+    assert [d[0].code for d in detector.detect_batch(texts)] == [detector.detect(t)[0].code for t in texts]
+    assert [d[0].code for d in detector.detect_batch(texts)] == ["en", "en", "ko", "es"]
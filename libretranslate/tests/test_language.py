@@ -0,0 +1,52 @@
+from libretranslate import language
+from libretranslate.language import LanguageRegistry, get_registry
+
+
+class FakeLanguage:
+    def __init__(self, code):
+        self.code = code
+        self.targets = []
+
+    def get_translation(self, to):
+        if to in self.targets:
+            return (self.code, to.code)
+        return None
+
+
+def make_languages(*codes):
+    languages = [FakeLanguage(code) for code in codes]
+    for src in languages:
+        src.targets = [tgt for tgt in languages if tgt is not src]
+    return languages
+
+
+def test_language_registry():
+    en, zh, pb = make_languages("en", "zh", "pb")
+    registry = LanguageRegistry([en, zh, pb])
+
+    assert registry.get("en") is en
+    assert registry.get("zh-hans") is zh
+    assert registry.get("pt-br") is pb
+    assert registry.get("fr") is None
+
+    assert registry.get_with_fallback("pt") is pb
+    assert registry.get_with_fallback("zt") is zh
+    assert registry.get_with_fallback("fr") is None
+
+    assert registry.get_translation(en, zh) == ("en", "zh")
+    assert registry.get_translation(en, en) is None
+
+
+def test_language_registry_rebuild(monkeypatch):
+    languages = make_languages("en", "es")
+    monkeypatch.setattr(language, "load_languages", lambda: languages)
+
+    registry = get_registry()
+    assert get_registry() is registry
+    assert registry.get("fr") is None
+
+    # Languages were reloaded (e.g. after installing models)
+    languages = make_languages("en", "es", "fr")
+    registry = get_registry()
+    assert registry.get("fr") is languages[2]
+    assert registry.get_translation(languages[0], languages[2]) == ("en", "fr")
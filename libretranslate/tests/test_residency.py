@@ -0,0 +1,120 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from libretranslate import residency
+from libretranslate.residency import ModelResidency, get_model_size, package_translations
+
+MB = 1024 * 1024
+
+
+class FakeTranslation:
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+        self.pkg = SimpleNamespace(package_path=name)
+        self.translator = object()
+
+    def load(self):
+        self.translator = object()
+
+
+@pytest.fixture(autouse=True)
+def model_sizes(monkeypatch):
+    monkeypatch.setattr(residency, "get_model_size", lambda t: t.size)
+
+
+def test_residency_budget():
+    r = ModelResidency(memory_budget_mb=2)
+    a, b, c = FakeTranslation("a", MB), FakeTranslation("b", MB), FakeTranslation("c", MB)
+    r.touch(a)
+    r.touch(b)
+    r.touch(a)
+    r.touch(c)
+
+    # b is the least recently used
+    assert list(r.resident) == [a, c]
+    assert b.translator is None
+    assert a.translator is not None
+    assert r.evicted == 1
+
+
+def test_residency_lease():
+    r = ModelResidency(memory_budget_mb=2)
+    a, b, c = FakeTranslation("a", MB), FakeTranslation("b", MB), FakeTranslation("c", MB)
+    r.touch(a)
+    r.touch(b)
+
+    with r.lease(a):
+        r.touch(c)
+
+        # a is in use, b goes instead
+        assert a.translator is not None
+        assert b.translator is None
+
+        b.load()
+        r.touch(b)
+        assert a.translator is not None
+        assert list(r.resident) == [a, b]
+
+    assert r.leases == {}
+
+
+def test_residency_lease_over_budget():
+    r = ModelResidency(memory_budget_mb=1)
+    a, b = FakeTranslation("a", MB), FakeTranslation("b", MB)
+
+    with r.lease(a), r.lease(b):
+        r.touch(a)
+        r.touch(b)
+
+        # Leased models stay loaded even over budget
+        assert a.translator is not None
+        assert b.translator is not None
+
+    # Going back under budget once the leases end
+    assert list(r.resident) == [a]
+    assert b.translator is None
+
+
+def test_residency_sweep():
+    r = ModelResidency(idle_ttl=0.05)
+    a, b, c = FakeTranslation("a", MB), FakeTranslation("b", MB), FakeTranslation("c", MB)
+    r.touch(a)
+    r.touch(b)
+    time.sleep(0.1)
+    r.touch(c)
+
+    with r.lease(b):
+        r.sweep()
+
+    # Idle models are unloaded, unless in use
+    assert set(r.resident) == {b, c}
+    assert a.translator is None
+    assert r.evicted == 1
+
+
+def test_residency_disabled():
+    r = ModelResidency()
+    a = FakeTranslation("a", MB)
+    r.touch(a)
+
+    assert not r.enabled
+    assert len(r.resident) == 0
+
+
+def test_package_translations():
+    a, b = FakeTranslation("a", MB), FakeTranslation("b", MB)
+    composite = SimpleNamespace(t1=a, t2=SimpleNamespace(underlying=b))
+
+    assert package_translations(composite) == [a, b]
+
+
+def test_get_model_size(tmp_path):
+    (tmp_path / "model").mkdir()
+    (tmp_path / "model" / "model.bin").write_bytes(b"x" * 1000)
+    (tmp_path / "model" / "shared_vocabulary.txt").write_bytes(b"x" * 24)
+
+    assert get_model_size(SimpleNamespace(pkg=SimpleNamespace(package_path=tmp_path))) == 1024
+    assert get_model_size(SimpleNamespace(pkg=SimpleNamespace(package_path=tmp_path / "missing"))) == 0
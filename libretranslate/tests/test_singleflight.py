@@ -0,0 +1,130 @@
+import threading
+import time
+
+import pytest
+
+from libretranslate import storage
+from libretranslate.singleflight import SingleFlight
+from libretranslate.storage import MemoryStorage
+
+
+@pytest.fixture()
+def shared_storage(monkeypatch):
+    s = MemoryStorage(sweep_interval=0)
+    monkeypatch.setattr(storage, "storage", s)
+    return s
+
+
+def run_concurrently(count, func):
+    results = [None] * count
+    def run(i):
+        try:
+            results[i] = func()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert not any(t.is_alive() for t in threads)
+
+    return results
+
+
+def test_singleflight_coalesces():
+    flights = SingleFlight()
+    calls = []
+    def work():
+        calls.append(1)
+        time.sleep(0.1)
+        return "result"
+
+    results = run_concurrently(5, lambda: flights.do("key", work))
+
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert flights.inflight == {}
+
+    # Later calls run again
+    assert flights.do("key", work) == "result"
+    assert len(calls) == 2
+
+
+def test_singleflight_keys():
+    flights = SingleFlight()
+    calls = []
+    def work():
+        calls.append(1)
+        time.sleep(0.05)
+        return threading.current_thread().name
+
+    results = run_concurrently(4, lambda: flights.do(threading.current_thread().name, work))
+
+    # Different keys don't wait for each other
+    assert len(calls) == 4
+    assert len(set(results)) == 4
+
+
+def test_singleflight_error():
+    flights = SingleFlight()
+    calls = []
+    def work():
+        calls.append(1)
+        time.sleep(0.1)
+        raise ValueError("failed")
+
+    results = run_concurrently(5, lambda: flights.do("key", work))
+
+    # Everyone waiting on the leader gets its error
+    assert len(calls) == 1
+    assert all(isinstance(r, ValueError) for r in results)
+    assert flights.inflight == {}
+
+
+def test_singleflight_workers(shared_storage):
+    cache = {}
+    calls = []
+    def work():
+        calls.append(1)
+        time.sleep(0.2)
+        cache["key"] = "result"
+        return "result"
+
+    # Two workers sharing the same storage
+    worker1 = SingleFlight(poll_interval=0.01)
+    worker2 = SingleFlight(poll_interval=0.01)
+
+    t = threading.Thread(target=lambda: worker1.do("key", work, lambda: cache.get("key")))
+    t.start()
+    time.sleep(0.05)
+    assert shared_storage.get_str("sflock_key") != ""
+
+    assert worker2.do("key", work, lambda: cache.get("key")) == "result"
+    t.join()
+
+    assert len(calls) == 1
+    assert shared_storage.get_str("sflock_key") == ""
+
+
+def test_singleflight_workers_timeout(shared_storage):
+    # A worker took the lock and never released it
+    shared_storage.set_nx("sflock_key", "1", ex=60)
+    flights = SingleFlight(lock_timeout=0.1, poll_interval=0.01)
+
+    start = time.time()
+    assert flights.do("key", lambda: "result", lambda: None) == "result"
+    assert time.time() - start >= 0.1
+
+
+def test_singleflight_workers_error(shared_storage):
+    flights = SingleFlight()
+    def work():
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError):
+        flights.do("key", work, lambda: None)
+
+    # The lock is released for the other workers
+    assert shared_storage.get_str("sflock_key") == ""
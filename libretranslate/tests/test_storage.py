@@ -0,0 +1,201 @@
+import time
+
+import pytest
+
+from libretranslate.storage import MemoryStorage, SQLiteStorage, add_decay, decay_score, shard_limit
+
+
+def test_memory_storage_max_keys():
+    s = MemoryStorage(max_keys=2, shards=1, sweep_interval=0)
+    s.set_str("a", "1")
+    s.set_str("b", "2")
+    s.get_str("a")
+    s.set_str("c", "3")
+
+    # Least recently used goes first
+    assert s.get_str("a") == "1"
+    assert s.get_str("b") == ""
+    assert s.get_str("c") == "3"
+
+
+def test_memory_storage_max_bytes():
+    s = MemoryStorage(max_bytes=1000, shards=1, sweep_interval=0)
+    for i in range(10):
+        s.set_str(f"key{i}", "x" * 200)
+
+    assert s.shards[0].bytes <= 1000
+    assert s.get_str("key9") == "x" * 200
+    assert s.get_str("key0") == ""
+
+
+def test_memory_storage_shard_limits():
+    assert [shard_limit(10, 4, i) for i in range(4)] == [3, 3, 2, 2]
+    assert [shard_limit(2, 4, i) for i in range(4)] == [1, 1, 1, 1]
+    assert shard_limit(-1, 4, 0) == -1
+
+    s = MemoryStorage(max_keys=10, max_bytes=-1, shards=4, sweep_interval=0)
+    assert sum(shard.max_keys for shard in s.shards) == 10
+    assert all(shard.max_bytes == -1 for shard in s.shards)
+
+    # Bounded by default
+    assert all(shard.max_keys > 0 and shard.max_bytes > 0 for shard in MemoryStorage(sweep_interval=0).shards)
+
+
+def test_memory_storage_pinned():
+    s = MemoryStorage(max_keys=2, shards=1, sweep_interval=0)
+    s.set_str("secret_0", "s0")
+    s.set_str("secret_1", "s1")
+    for i in range(10):
+        s.set_str(f"key{i}", str(i))
+
+    # Secrets are never evicted
+    assert s.get_str("secret_0") == "s0"
+    assert s.get_str("secret_1") == "s1"
+    assert s.get_str("key9") == "9"
+    assert s.get_str("key8") == ""
+
+
+def test_memory_storage_sweep():
+    s = MemoryStorage(shards=1, sweep_interval=0)
+    s.set_str("short", "1", ex=0.01)
+    s.set_str("long", "2", ex=60)
+    time.sleep(0.05)
+    s.sweep()
+
+    assert list(s.shards[0].data) == ["long"]
+    assert s.shards[0].bytes > 0
+
+
+def test_memory_storage_hash():
+    s = MemoryStorage(sweep_interval=0)
+    s.set_hash_int("ns", "a", 1)
+    s.inc_hash_int("ns", "a")
+    s.set_hash_int("ns", "b", 5)
+    s.dec_hash_int("ns", "b")
+
+    assert s.get_all_hash_int("ns") == {"a": 2, "b": 4}
+    assert s.get_all_hash_int("missing") == {}
+
+    s.del_hash("ns", "a")
+    assert s.get_all_hash_int("ns") == {"b": 4}
+
+
+def test_memory_storage_batch():
+    s = MemoryStorage(sweep_interval=0)
+    s.set_many({"a": "1", "b": "2"})
+
+    assert s.get_many(["a", "b", "c"]) == ["1", "2", ""]
+
+
+def test_sqlite_storage_shared(tmp_path):
+    db_path = str(tmp_path / "storage.db")
+    s1 = SQLiteStorage(db_path, cache_ttl=0, cleanup_interval=0)
+    s2 = SQLiteStorage(db_path, cache_ttl=0, cleanup_interval=0)
+
+    s1.set_str("a", "1")
+    s1.set_hash_int("ns", "k", 3)
+    s1.inc_hash_int("ns", "k")
+
+    assert s2.get_str("a") == "1"
+    assert s2.get_all_hash_int("ns") == {"k": 4}
+
+    s2.del_str("a")
+    assert s1.get_str("a") == ""
+
+
+def test_sqlite_storage_expiry(tmp_path):
+    s = SQLiteStorage(str(tmp_path / "storage.db"), cache_ttl=0, cleanup_interval=0)
+    s.set_str("a", "1", ex=0.01)
+    time.sleep(0.05)
+
+    assert s.get_str("a") == ""
+
+    s.cleanup()
+    assert s.conn().execute("SELECT COUNT(*) FROM kv").fetchone()[0] == 0
+
+
+def test_sqlite_storage_set_nx(tmp_path):
+    s = SQLiteStorage(str(tmp_path / "storage.db"), cache_ttl=0, cleanup_interval=0)
+
+    assert s.set_nx("lock", "1", ex=0.05)
+    assert not s.set_nx("lock", "2", ex=0.05)
+
+    # Expired locks can be taken again
+    time.sleep(0.1)
+    assert s.set_nx("lock", "3", ex=60)
+    assert s.get_str("lock") == "3"
+
+
+def test_sqlite_storage_cache(tmp_path):
+    db_path = str(tmp_path / "storage.db")
+    s1 = SQLiteStorage(db_path, cache_ttl=60, cleanup_interval=0)
+    s2 = SQLiteStorage(db_path, cache_ttl=60, cleanup_interval=0)
+
+    # Locks and secrets are always read from the database
+    assert s2.get_str("sflock_a") == ""
+    assert s1.set_nx("sflock_a", "1", ex=60)
+    assert s2.get_str("sflock_a") == "1"
+    s1.del_str("sflock_a")
+    assert s2.get_str("sflock_a") == ""
+
+    s1.set_str("secret_0", "a")
+    assert s2.get_str("secret_0") == "a"
+    s1.set_str("secret_0", "b")
+    assert s2.get_many(["secret_0"]) == ["b"]
+
+    # Cached translations never change
+    s1.set_str("tcache_a", "1")
+    assert s2.get_str("tcache_a") == "1"
+    s1.conn().execute("DELETE FROM kv")
+    assert s2.get_str("tcache_a") == "1"
+
+
+def test_sqlite_storage_batch(tmp_path):
+    s = SQLiteStorage(str(tmp_path / "storage.db"), cleanup_interval=0)
+    s.set_many({"a": "1", "b": "2"})
+
+    assert s.get_many(["a", "b", "c"]) == ["1", "2", ""]
+
+
+def test_decay_score():
+    assert decay_score("", 0.1) == 0
+    assert decay_score("3|100", 0.1, now=110) == 2
+    assert decay_score("3|100", 0.1, now=200) == 0
+
+    assert add_decay("3|100", 1, 0.1, now=110) == (3, "3.0|110")
+    assert add_decay("3|100", 5, 0.1, cap=4, now=110) == (4, "4|110")
+    assert add_decay("3|100", -2, 0.1, now=110) == (0, None)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def storage(request, tmp_path):
+    if request.param == "memory":
+        return MemoryStorage(sweep_interval=0)
+    return SQLiteStorage(str(tmp_path / "storage.db"), cache_ttl=0, cleanup_interval=0)
+
+
+def test_inc_decay(storage):
+    assert storage.inc_decay("score", 1, 10) == 1
+    assert storage.inc_decay("score", 1, 10) == pytest.approx(2, abs=0.1)
+
+    time.sleep(0.1)
+    assert decay_score(storage.get_str("score"), 10) == pytest.approx(1, abs=0.2)
+
+    # Scores expire once they have decayed to zero
+    time.sleep(0.2)
+    assert storage.get_str("score") == ""
+
+
+def test_inc_decay_cap(storage):
+    for i in range(5):
+        score = storage.inc_decay("score", 1, 0.001, cap=3)
+
+    assert score == 3
+    assert decay_score(storage.get_str("score"), 0.001) == pytest.approx(3, abs=0.01)
+
+
+def test_inc_decay_remove(storage):
+    storage.inc_decay("score", 1, 0.001)
+
+    assert storage.inc_decay("score", -2, 0.001) == 0
+    assert storage.get_str("score") == ""